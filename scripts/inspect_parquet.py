@@ -0,0 +1,66 @@
+# Copyright 2024 Bytedance Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Inspect a parquet dataset (e.g. the preprocessed gsm8k files) without loading it.
+
+Schema and row counts come from the file metadata alone, and the sample rows are
+decoded from the first record batch only, so inspection cost is O(batch) instead
+of O(file).
+"""
+import argparse
+
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect a parquet file without a full read')
+    parser.add_argument('file_path', help='path to the parquet file')
+    parser.add_argument('--columns', nargs='*', default=None, help='columns to include in the sample rows')
+    parser.add_argument('--num-rows', type=int, default=5, help='number of sample rows to decode')
+    parser.add_argument('--filter',
+                        nargs=2,
+                        metavar=('COLUMN', 'VALUE'),
+                        default=None,
+                        help='only keep rows where COLUMN equals VALUE, pruned via row-group statistics')
+    args = parser.parse_args()
+
+    pf = pq.ParquetFile(args.file_path, memory_map=True)
+    metadata = pf.metadata
+    print(f'num_rows: {metadata.num_rows}')
+    print(f'num_row_groups: {metadata.num_row_groups}')
+    print(f'schema:\n{pf.schema_arrow}')
+
+    if args.filter is not None:
+        # evaluate the predicate against row-group statistics first, so row-groups
+        # whose min/max exclude the value are never decompressed
+        column, value = args.filter
+        scanner = ds.dataset(args.file_path).scanner(columns=args.columns, filter=ds.field(column) == value)
+        batch = next(iter(scanner.to_batches()), None)
+        if batch is None:
+            print(f'\nno rows matched filter {column} == {value}')
+            return
+        batch = batch.slice(0, args.num_rows)
+    else:
+        # decode only the first batch of the first row-group instead of reading the file
+        batch = next(pf.iter_batches(batch_size=args.num_rows, columns=args.columns), None)
+        if batch is None:
+            print('\nfile has no rows, nothing to sample')
+            return
+    for name, column in zip(batch.schema.names, batch.columns):
+        print(f'\ncolumn {name}:')
+        print(column.to_pylist())
+
+
+if __name__ == '__main__':
+    main()
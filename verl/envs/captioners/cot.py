@@ -1,8 +1,20 @@
-import copy
-import re
-
 from verl.envs.captioners.base import BaseCaptioner
 
+# Static CoT instructions, stripped once at import time instead of per step.
+# The inner indentation matches the previous inline strings byte-for-byte.
+_COT_INSTRUCTIONS_BABAISAI = """
+What will you do next? Please respond in the following format:
+    THINK: step-by-step reasoning
+    ACTION: One valid action from the allowed set: idle, up, right, down, left
+""".strip()
+
+_COT_INSTRUCTIONS = """
+What will you do next? Please respond in the following format:
+    THINK: step-by-step reasoning
+    ACTION: One valid action from the allowed set.
+""".strip()
+
+
 class COTCaptioner(BaseCaptioner):
     """A captioner that performs actions using a chain-of-thought reasoning process."""
 
@@ -29,30 +41,26 @@ class COTCaptioner(BaseCaptioner):
         messages = self.prompt_builder.get_prompt()
 
         # Add CoT-specific instructions to the prompt
-        
+
         if self.env_name == "babaisai":
-            cot_instructions = """
-    What will you do next? Please respond in the following format:
-    THINK: step-by-step reasoning
-    ACTION: One valid action from the allowed set: idle, up, right, down, left
-            """.strip()
+            cot_instructions = _COT_INSTRUCTIONS_BABAISAI
         else:
-            cot_instructions = """
-    What will you do next? Please respond in the following format:
-    THINK: step-by-step reasoning
-    ACTION: One valid action from the allowed set.
-            """.strip()
-
-        messages[-1].content += "\n\n" + cot_instructions
+            cot_instructions = _COT_INSTRUCTIONS
 
         # convert messages to dict format
-        prompts = []
-        for message in messages:
-            role = message.role
-            content = message.content
-            prompts.append({"role": role, "content": content})
+        prompt = [{"role": m.role, "content": m.content} for m in messages]
+
+        # Keep the static instructions in the system prefix so the inference
+        # engine sees an unchanged prompt prefix across steps (prefix caching);
+        # only the per-step observation turns vary at the tail. Appended to the
+        # returned dicts, not the Message objects, so the builder's cached
+        # system message is never mutated.
+        if prompt and prompt[0]["role"] == "system":
+            prompt[0]["content"] += "\n\n" + cot_instructions
+        else:
+            prompt[-1]["content"] += "\n\n" + cot_instructions
 
-        return prompts
+        return prompt
     
     def update_action(self, full_action, executed_action):
         self.prompt_builder.update_reasoning(full_action)
@@ -1,8 +1,10 @@
-import copy
-import re
-
 from verl.envs.captioners.base import BaseCaptioner
 
+# Static instruction, stripped once at import time instead of per step.
+_NAIVE_INSTRUCTION = """
+You always have to output one of the above actions at a time and no other text. You always have to output an action until the episode terminates.
+""".strip()
+
 
 class NaiveCaptioner(BaseCaptioner):
     """A captioner that generates actions based on observations without complex reasoning."""
@@ -25,19 +27,18 @@ class NaiveCaptioner(BaseCaptioner):
 
         messages = self.prompt_builder.get_prompt()
 
-        naive_instruction = """
-You always have to output one of the above actions at a time and no other text. You always have to output an action until the episode terminates.
-        """.strip()
-
-        if messages and messages[-1].role == "user":
-            messages[-1].content += "\n\n" + naive_instruction
-            
         # TODO: remove the transformation
-        prompt = []
-        for message in messages:
-            role = message.role
-            content = message.content
-            prompt.append({"role": role, "content": content})
+        prompt = [{"role": m.role, "content": m.content} for m in messages]
+
+        # Keep the static instruction in the system prefix so the inference
+        # engine sees an unchanged prompt prefix across steps (prefix caching);
+        # only the per-step observation turns vary at the tail. Appended to the
+        # returned dicts, not the Message objects, so the builder's cached
+        # system message is never mutated.
+        if prompt and prompt[0]["role"] == "system":
+            prompt[0]["content"] += "\n\n" + _NAIVE_INSTRUCTION
+        elif prompt and prompt[-1]["role"] == "user":
+            prompt[-1]["content"] += "\n\n" + _NAIVE_INSTRUCTION
 
         return prompt
     
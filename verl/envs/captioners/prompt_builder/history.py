@@ -36,10 +36,18 @@ class HistoryPromptBuilder:
         self._last_short_term_obs = None  # To store the latest short-term observation
         self.previous_reasoning = None
         self.max_cot_history = max_cot_history
+        self._system_message = None  # Cached system Message, rebuilt only when the prompt changes
 
     def update_instruction_prompt(self, instruction: str):
-        """Set the system-level instruction prompt."""
-        self.system_prompt = instruction
+        """Set the system-level instruction prompt.
+
+        The cached system message is only rebuilt when the instruction actually
+        changes, keeping the prompt prefix byte-identical across steps so the
+        inference engine's prefix cache stays warm.
+        """
+        if instruction != self.system_prompt:
+            self.system_prompt = instruction
+            self._system_message = None
 
     def update_observation(self, obs: dict):
         """Add an observation to the prompt history, which can include text, an image, or both."""
@@ -85,7 +93,9 @@ class HistoryPromptBuilder:
         messages = []
 
         if self.system_prompt and not icl_episodes:
-            messages.append(Message(role="system", content=self.system_prompt))
+            if self._system_message is None or self._system_message.content != self.system_prompt:
+                self._system_message = Message(role="system", content=self.system_prompt)
+            messages.append(self._system_message)
 
         # Determine which text observations to include
         text_needed = self.max_text_history + 1
@@ -1,49 +1,64 @@
+import re
+
 import gymnasium as gym
 from PIL import Image
 
+from verl.envs.environments.env_wrapper import make_reward_shaper
+
+# One compiled alternation so counting backtrack markers is a single pass over
+# the response instead of one str.count scan (plus a .lower copy) per keyword.
+_BACKTRACK_RE = re.compile(r"\b(?:however|different|but|wait|won't|can't|cannot|another)\b", re.IGNORECASE)
+
+# One pattern per marker, tried in order, so "ACTION:" outranks "action:"
+# outranks "Action" like the original if/elif chain; the greedy prefix makes
+# each pattern capture after its marker's *last* occurrence, matching
+# split(...)[-1].
+_ACTION_RES = tuple(re.compile(r"(?s).*" + marker + r"(.*)") for marker in ("ACTION:", "action:", "Action"))
+
+# Lowercases ASCII and maps "_" to " " in a single C-level pass instead of
+# the two scans (and two copies) of .lower() followed by .replace().
+_NORM_TABLE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ_", "abcdefghijklmnopqrstuvwxyz ")
+
+
 class BabaIsAILLMAgentsWrapper(gym.Wrapper):
     def __init__(self, env, vlm=False, **kwargs):
         super().__init__(env)
         self.env = env
         self.format_penalty = kwargs.get("format_penalty", 0.0)
         self.binary_reward = kwargs.get("binary_reward", False)
-        
+        self._shape_reward = make_reward_shaper(self.format_penalty, self.binary_reward)
+        self._action_set = frozenset(env.language_action_space)
+        # pin the constant default action locally so the invalid-action path
+        # does not go through __getattr__ delegation every step
+        self.default_action = env.default_action
+
     def __getattr__(self, name):
         return getattr(self.env, name)
-    
+
     def step(self, action, is_valid=True):
         obs, reward, terminated, truncated, info = self.env.step(action)
-        if not is_valid:
-            reward = -self.format_penalty
-        if self.binary_reward:
-            reward = 1.0 if reward > 0 else reward
-        return obs, reward*1.0, terminated, truncated, info
-       
+        return obs, self._shape_reward(reward, is_valid), terminated, truncated, info
+
+
     def extract_action(self, action):
         
-        full_action = str(action)
-        
-        if "ACTION:" in action:
-            action = action.split("ACTION:")[-1].strip()
-        elif "action:" in action:
-            action = action.split("action:")[-1].strip()
-        elif "Action" in action:
-            action = action.split("Action")[-1].strip()
-            
-        lower_pred_action = action.lower()
+        full_action = action if isinstance(action, str) else str(action)
         
-        lower_pred_action = lower_pred_action.replace("_", " ")
-            
-        action = lower_pred_action
-        
-        is_valid = action in self.language_action_space
+        for pattern in _ACTION_RES:
+            match = pattern.match(action)
+            if match:
+                action = match.group(1).strip()
+                break
+
+        action = action.translate(_NORM_TABLE)
+
+
+        is_valid = action in self._action_set
         valid_action = action if is_valid else self.default_action
         
-        total_but_occurrences = 0
-        for word in ["However", "different", "but", "wait", "won't", "can't", "cannot", "another"]:
-            total_but_occurrences += full_action.lower().count(word.lower())
+        total_but_occurrences = len(_BACKTRACK_RE.findall(full_action))
         metrics = {
-            "behavior/valid_action_ratio": is_valid * 1.0,
+            "behavior/valid_action_ratio": float(is_valid),
             "behavior/backtrack_length": total_but_occurrences
         }
         
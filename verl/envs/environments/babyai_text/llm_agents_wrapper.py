@@ -1,6 +1,10 @@
+import re
+
 import gymnasium as gym
 from PIL import Image
 
+from verl.envs.environments.env_wrapper import make_reward_shaper
+
 POSSIBLE_ACTIONS = [
     "turn left",
     "turn to the left",
@@ -22,64 +26,81 @@ POSSIBLE_ACTIONS = [
     "opening",
 ]
 
+# Plan phrases and backtrack markers are counted in one combined linear scan;
+# the named group that fires tells which counter to bump. Longest alternatives
+# come first so e.g. "dropping" counts as one phrase instead of matching
+# "drop" and leaving a dangling suffix.
+_KEYWORD_RE = re.compile(
+    "(?P<plan>"
+    + "|".join(re.escape(p) for p in sorted(POSSIBLE_ACTIONS, key=len, reverse=True))
+    + r")|(?P<backtrack>\b(?:however|different|but|wait|won't|can't|cannot|another)\b)",
+    re.IGNORECASE,
+)
+
+# One pattern per marker, tried in order, so "ACTION:" outranks "action:"
+# outranks "Action" like the original if/elif chain; the greedy prefix makes
+# each pattern capture after its marker's *last* occurrence, matching
+# split(...)[-1].
+_ACTION_RES = tuple(re.compile(r"(?s).*" + marker + r"(.*)") for marker in ("ACTION:", "action:", "Action"))
+
+# Lowercases ASCII and maps "_" to " " in a single C-level pass instead of
+# the two scans (and two copies) of .lower() followed by .replace().
+_NORM_TABLE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ_", "abcdefghijklmnopqrstuvwxyz ")
+
+# Alias table replacing the if/elif normalization chain with one dict lookup.
+_ACTION_ALIASES = {
+    "turnleft": "turn left",
+    "turnright": "turn right",
+    "goforward": "go forward",
+    "pickup": "pick up",
+}
+
+
 class BabyAILLMAgentsWrapper(gym.Wrapper):
     def __init__(self, env, vlm=False, **kwargs):
         super().__init__(env)
         self.env = env
         self.format_penalty = kwargs.get("format_penalty", 0.0)
         self.binary_reward = kwargs.get("binary_reward", False)
-        
+        self._shape_reward = make_reward_shaper(self.format_penalty, self.binary_reward)
+        self._action_set = frozenset(env.language_action_space)
+        # pin the constant default action locally so the invalid-action path
+        # does not go through __getattr__ delegation every step
+        self.default_action = env.default_action
+
     def __getattr__(self, name):
         return getattr(self.env, name)
-    
+
     def step(self, action, is_valid=True):
         obs, reward, terminated, truncated, info = self.env.step(action)
-        if not is_valid:
-            reward = -self.format_penalty
-        if self.binary_reward:
-            reward = 1.0 if reward > 0 else reward
-        return obs, reward*1.0, terminated, truncated, info
+        return obs, self._shape_reward(reward, is_valid), terminated, truncated, info
     
     def extract_action(self, action):
         
-        full_action = str(action)
-        
-        if "ACTION:" in action:
-            action = action.split("ACTION:")[-1].strip()
-        elif "action:" in action:
-            action = action.split("action:")[-1].strip()
-        elif "Action" in action:
-            action = action.split("Action")[-1].strip()
-            
-        lower_pred_action = action.lower()
-        
-        lower_pred_action = lower_pred_action.replace("_", " ")
-        if lower_pred_action == "turnleft":
-            lower_pred_action = "turn left"
-        elif lower_pred_action == "turnright":
-            lower_pred_action = "turn right"
-        elif lower_pred_action == "goforward":
-            lower_pred_action = "go forward"
-        elif lower_pred_action == "pickup":
-            lower_pred_action = "pick up"
-            
-        action = lower_pred_action
+        full_action = action if isinstance(action, str) else str(action)
         
-        valid_action = action if action in self.language_action_space else self.default_action
+        for pattern in _ACTION_RES:
+            match = pattern.match(action)
+            if match:
+                action = match.group(1).strip()
+                break
+
+        lower_pred_action = action.translate(_NORM_TABLE)
+        action = _ACTION_ALIASES.get(lower_pred_action, lower_pred_action)
         
+        is_valid = action in self._action_set
+        valid_action = action if is_valid else self.default_action
+
         total_action_occurrences = 0
-        for p_action in POSSIBLE_ACTIONS:
-            total_action_occurrences += full_action.lower().count(p_action.lower())
-        
-        is_valid = action in self.language_action_space
-        valid_count = 1.0 if is_valid else 0.0
-        
         total_but_occurrences = 0
-        for word in ["However", "different", "but", "wait", "won't", "can't", "cannot", "another"]:
-            total_but_occurrences += full_action.lower().count(word.lower())
-        
+        for match in _KEYWORD_RE.finditer(full_action):
+            if match.lastgroup == "plan":
+                total_action_occurrences += 1
+            else:
+                total_but_occurrences += 1
+
         metrics = {
-            "behavior/valid_action_ratio": valid_count,
+            "behavior/valid_action_ratio": float(is_valid),
             "behavior/plan_length": total_action_occurrences,
             "behavior/backtrack_length": total_but_occurrences
         }
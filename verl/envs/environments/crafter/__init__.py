@@ -1,3 +1,5 @@
+import functools
+
 from .env import ACTIONS, CrafterLanguageWrapper
 from .llm_agents_wrapper import CrafterLLMAgentsWrapper
 
@@ -47,18 +49,35 @@ ACHIEVEMENTS = [
     "Collect Diamond"
 ]
 
+# The action list never changes, so its text is built once at import time.
+_ACTION_STRINGS = ",\n".join(f"{action}: {ACTION_DICT[action]}" for action in ACTIONS)
+
+_ACHIEVEMENT_INDEX = {name: i for i, name in enumerate(ACHIEVEMENTS)}
+_ALL_ACHIEVEMENTS = tuple(ACHIEVEMENTS)
+
+
 def get_instruction_prompt(task=None, info=None):
-    
+
     if info is not None:
-        achievements_list = info["achievements"]
-        achievements_list = [key for key, value in achievements_list.items() if value == 0]
-        achievements_list = [x.replace("_", " ").title() for x in achievements_list]
-        achievements_list = [x for x in ACHIEVEMENTS if x in achievements_list]
+        remaining = [key.replace("_", " ").title() for key, value in info["achievements"].items() if value == 0]
+        if not remaining:
+            return _build_instruction_prompt(())
+        # restore canonical ACHIEVEMENTS order: O(k log k) over the k remaining
+        # names instead of rescanning the full achievement list
+        remaining = [x for x in remaining if x in _ACHIEVEMENT_INDEX]
+        achievements_list = tuple(sorted(remaining, key=_ACHIEVEMENT_INDEX.get))
     else:
-        achievements_list = ACHIEVEMENTS
+        achievements_list = _ALL_ACHIEVEMENTS
+    return _build_instruction_prompt(achievements_list)
+
+
+@functools.lru_cache(maxsize=64)
+def _build_instruction_prompt(achievements_list):
+    # The prompt depends only on the set of remaining achievements, which
+    # recurs across steps and episodes, so the ~2KB string build is memoized.
     achievements_text = ",\n".join(f"{i+1}. {achievement}" for i, achievement in enumerate(achievements_list))
-    
-    action_strings = ",\n".join(f"{action}: {ACTION_DICT[action]}" for action in ACTIONS)
+
+    action_strings = _ACTION_STRINGS
     instruction_prompt = f"""
 You are an agent playing Crafter. The following are the only valid actions you can take in the game, followed by a short description of each action:
 
@@ -1,8 +1,10 @@
 import gymnasium as gym
 from PIL import Image
-import numpy as np
+import random
 import re
 
+from verl.envs.environments.env_wrapper import make_reward_shaper
+
 POSSIBLE_ACTIONS = [
     "Move West",
     "Move East",
@@ -31,98 +33,133 @@ POSSIBLE_ACTIONS = [
     "Crafting ",
 ]
 
+# Plan phrases and backtrack markers are counted in one combined linear scan;
+# the named group that fires tells which counter to bump. Longest alternatives
+# come first so e.g. "Sleeping" counts as one phrase instead of matching
+# "Sleep" and leaving a dangling suffix.
+_KEYWORD_RE = re.compile(
+    "(?P<plan>"
+    + "|".join(re.escape(p) for p in sorted(POSSIBLE_ACTIONS, key=len, reverse=True))
+    + r")|(?P<backtrack>\b(?:however|different|but|wait|won't|can't|cannot|another)\b)",
+    re.IGNORECASE,
+)
+
+# Both halves around the *last* action marker in one scan: group 1 is the
+# reasoning prefix (reused when rebuilding full_action); group 2 captures the
+# first line of the action tail, with \s* eating any whitespace (including
+# newlines) between the marker and the action text. One pattern per marker,
+# tried in order, so "ACTION:" outranks "action:" outranks "Action" even when
+# a lower-priority marker appears later in the text.
+_ACTION_PARTS_RES = tuple(
+    re.compile(r"(?s)(.*)" + marker + r"\s*([^\n]*)") for marker in ("ACTION:", "action:", "Action"))
+
+# Strips parenthetical asides like "Do (chop the tree)".
+_PAREN_RE = re.compile(r"\([^)]*\)")
+
+# Alias table replacing the if/elif normalization chain with one dict lookup.
+# Diagonal spellings map to a pair of cardinal moves; one of the pair is picked
+# at random on hit, matching the previous np.random.choice behavior.
+_ACTION_ALIASES = {
+    "Collect Stone": "Do",
+    "Mine Stone": "Do",
+    "Chop Tree": "Do",
+    "Chop": "Do",
+    "Chop Trees": "Do",
+    "Cut Tree": "Do",
+    "Chop_Tree": "Do",
+    "Cut": "Do",
+    "Collect Wood": "Do",
+    "Drink": "Do",
+    "Drink From Water": "Do",
+    "Drink From Lakes": "Do",
+    "Mine": "Do",
+    "Collect Coal": "Do",
+    "Collect Iron": "Do",
+    "Mine Coal": "Do",
+    "Defeat Zombie": "Do",
+    "Defeat Skeleton": "Do",
+    "Eat Cow": "Do",
+    "Attack": "Do",
+    "Collect Sapling": "Do",
+    "Make Table": "Place Table",
+    "Make Crafting Table": "Place Table",
+    "Make Furnace": "Place Furnace",
+}
+for _first, _second in (("North", "West"), ("South", "West"), ("North", "East"), ("South", "East")):
+    _pair = (f"Move {_first}", f"Move {_second}")
+    for _spelling in (f"{_first} {_second}", f"{_first}{_second}", f"{_first}-{_second}", f"{_first}{_second.lower()}"):
+        _ACTION_ALIASES[f"Move {_spelling}"] = _pair
+for _cardinal in ("North", "South", "East", "West"):
+    _ACTION_ALIASES[f"Move {_cardinal} 1 Step"] = f"Move {_cardinal}"
+    _ACTION_ALIASES[f"Move {_cardinal} 2 Steps"] = f"Move {_cardinal}"
+    _ACTION_ALIASES[f"Move {_cardinal} 3 Steps"] = f"Move {_cardinal}"
+
+
 class CrafterLLMAgentsWrapper(gym.Wrapper):
     def __init__(self, env, vlm=False, **kwargs):
         super().__init__(env)
         self.env = env
         self.format_penalty = kwargs.get("format_penalty", 0.0)
         self.binary_reward = kwargs.get("binary_reward", False)
-        
+        self._shape_reward = make_reward_shaper(self.format_penalty, self.binary_reward)
+        self._action_set = frozenset(env.language_action_space)
+        # pin the constant default action locally so the invalid-action path
+        # does not go through __getattr__ delegation every step
+        self.default_action = env.default_action
+
     def __getattr__(self, name):
         return getattr(self.env, name)
-    
+
     def step(self, action, is_valid=True):
         obs, reward, terminated, truncated, info = self.env.step(action)
-        if not is_valid:
-            reward = -self.format_penalty
-        if self.binary_reward:
-            reward = 1.0 if reward > 0 else reward
-        return obs, reward*1.0, terminated, truncated, info
+        return obs, self._shape_reward(reward, is_valid), terminated, truncated, info
        
            
     def extract_action(self, action):
         
-        full_action = str(action)
+        full_action = action if isinstance(action, str) else str(action)
         
-        if "ACTION:" in action:
-            action = action.split("ACTION:")[-1].strip()
-        elif "action:" in action:
-            action = action.split("action:")[-1].strip()
-        elif "Action" in action:
-            action = action.split("Action")[-1].strip()
-            
-        lower_pred_action = action.lower()
-        action = lower_pred_action.title()
+        match = None
+        for pattern in _ACTION_PARTS_RES:
+            match = pattern.match(full_action)
+            if match:
+                action = match.group(2).strip()
+                break
+
+        action = action.lower().title()
         if "\n" in action:
             action = action.split("\n")[0].strip()
         if action.endswith(".") or action.endswith(","):
             action = action[:-1]
-        
-        if action == "Move North West" or action == "Move NorthWest" or action == "Move North-West" or action == "Move Northwest":
-            action = np.random.choice(["Move North", "Move West"])
-        elif action == "Move South West" or action == "Move SouthWest" or action == "Move South-West" or action == "Move Southwest":
-            action = np.random.choice(["Move South", "Move West"])
-        elif action == "Move North East" or action == "Move NorthEast" or action == "Move North-East" or action == "Move Northeast":
-            action = np.random.choice(["Move North", "Move East"])
-        elif action == "Move South East" or action == "Move SouthEast" or action == "Move South-East" or action == "Move Southeast":
-            action = np.random.choice(["Move South", "Move East"])
-        elif action == "Move North 1 Step" or action == "Move North 2 Steps" or action == "Move North 3 Steps":
-            action = "Move North"
-        elif action == "Move South 1 Step" or action == "Move South 2 Steps" or action == "Move South 3 Steps":
-            action = "Move South"
-        elif action == "Move East 1 Step" or action == "Move East 2 Steps" or action == "Move East 3 Steps":
-            action = "Move East"
-        elif action == "Move West 1 Step" or action == "Move West 2 Steps" or action == "Move West 3 Steps":
-            action = "Move West"
-        elif action == "Collect Stone" or action == "Mine Stone":
-            action = "Do"
-        elif action == "Chop Tree" or action == "Chop" or action == "Chop Trees" or action == "Cut Tree" or action == "Chop_Tree" or action == "Cut" or action == "Collect Wood":
-            action = "Do"
-        elif action == "Drink" or action == "Drink From Water" or action == "Drink From Lakes":
-            action = "Do"
-        elif action == "Mine" or action == "Collect Coal" or action == "Collect Iron" or action == "Mine Coal":
-            action = "Do"
-        elif action == "Defeat Zombie" or action == "Defeat Skeleton" or action == "Eat Cow" or action == "Attack" or action == "Collect Sapling" :
-            action = "Do"
-        elif action == "Make Table" or action == "Make Crafting Table":
-            action = "Place Table"
-        elif action == "Make Furnace":
-            action = "Place Furnace"
-            
+
+
+        alias = _ACTION_ALIASES.get(action)
+        if isinstance(alias, tuple):
+            # one cheap bit draw instead of random.choice's index arithmetic
+            action = alias[random.getrandbits(1)]
+        elif alias is not None:
+            action = alias
+
+
         if "Do" in action and "(" in action:
-            pattern = r'\([^)]*\)'
-            action = re.sub(pattern, '', action).strip()
+            action = _PAREN_RE.sub('', action).strip()
             
-        is_valid = action in self.language_action_space
+        is_valid = action in self._action_set
         valid_action = action if is_valid else self.default_action
         
-        if "ACTION:" in full_action:
-            full_action = full_action.split("ACTION:")[0].strip()
-        elif "action:" in action:
-            full_action = full_action.split("action:")[0].strip()
-        elif "Action" in full_action:
-            full_action = full_action.split("Action")[0].strip()
+        if match:
+            full_action = match.group(1).strip()
         full_action += "\nACTION: " + valid_action + ".\n"
         
         total_action_occurrences = 0
-        for p_action in POSSIBLE_ACTIONS:
-            total_action_occurrences += full_action.lower().count(p_action.lower())
-        
         total_but_occurrences = 0
-        for word in ["However", "different", "but", "wait", "won't", "can't", "cannot", "another"]:
-            total_but_occurrences += full_action.lower().count(word.lower())
+        for match in _KEYWORD_RE.finditer(full_action):
+            if match.lastgroup == "plan":
+                total_action_occurrences += 1
+            else:
+                total_but_occurrences += 1
         metrics = {
-            "behavior/valid_action_ratio": is_valid * 1.0,
+            "behavior/valid_action_ratio": float(is_valid),
             "behavior/plan_length": total_action_occurrences,
             "behavior/backtrack_length": total_but_occurrences
         }
@@ -1,6 +1,25 @@
 import gymnasium as gym
 
 
+def make_reward_shaper(format_penalty, binary_reward):
+    """Build the reward-shaping function the LLM wrappers apply on every step.
+
+    The format_penalty/binary_reward branches are fixed per wrapper instance,
+    so the right closure is picked once at construction instead of
+    re-evaluating both branches on every transition.
+    """
+    penalty = -format_penalty * 1.0
+    if binary_reward:
+        def shape_reward(reward, is_valid):
+            if not is_valid:
+                reward = penalty
+            return 1.0 if reward > 0 else reward * 1.0
+    else:
+        def shape_reward(reward, is_valid):
+            return reward * 1.0 if is_valid else penalty
+    return shape_reward
+
+
 class EnvWrapper(gym.Wrapper):
     """
     A wrapper class for gym environments to standardize interactions across different environments.
@@ -1,57 +1,67 @@
 import itertools
+import random
+import re
 
 import crafter
 import gym
-import numpy as np
 from PIL import Image
 
 from verl.envs.environments import Strings
+from verl.envs.environments.env_wrapper import make_reward_shaper
 from verl.envs.environments.minihack import get_available_actions
 
+# One compiled alternation so counting backtrack markers is a single pass over
+# the response instead of one str.count scan (plus a .lower copy) per keyword.
+_BACKTRACK_RE = re.compile(r"\b(?:however|different|but|wait|won't|can't|cannot|another)\b", re.IGNORECASE)
+
+# One pattern per marker, tried in order, so "ACTION:" outranks "action:"
+# outranks "Action" like the original if/elif chain; the greedy prefix makes
+# each pattern capture after its marker's *last* occurrence, matching
+# split(...)[-1].
+_ACTION_RES = tuple(re.compile(r"(?s).*" + marker + r"(.*)") for marker in ("ACTION:", "action:", "Action"))
+
+
 class MiniHackLLMAgentsWrapper(gym.Wrapper):
-    def __init__(self, env):
+    def __init__(self, env, vlm=False, **kwargs):
         super().__init__(env)
         self.all_posible_default_action = ["north", "east", "south", "west"]
-        self.default_action = self.all_posible_default_action[np.random.randint(4)]
+        self.default_action = random.choice(self.all_posible_default_action)
         self.language_action_space = get_available_actions(env)
+        self._action_set = frozenset(self.language_action_space)
         self.format_penalty = kwargs.get("format_penalty", 0.0)
         self.binary_reward = kwargs.get("binary_reward", False)
-    
+        self._shape_reward = make_reward_shaper(self.format_penalty, self.binary_reward)
+
     def __getattr__(self, name):
         return getattr(self.env, name)
-    
+
     def step(self, action, is_valid=True):
         obs, reward, terminated, truncated, info = self.env.step(action)
-        if not is_valid:
-            reward = -self.format_penalty
-        if self.binary_reward:
-            reward = 1.0 if reward > 0 else reward
-        return obs, reward*1.0, terminated, truncated, info
+        return obs, self._shape_reward(reward, is_valid), terminated, truncated, info
     
     def extract_action(self, action):
         
-        self.default_action = self.all_posible_default_action[np.random.randint(4)]
-        
         full_action = str(action)
         
-        if "ACTION:" in action:
-            action = action.split("ACTION:")[-1].strip()
-        elif "action:" in action:
-            action = action.split("action:")[-1].strip()
-        elif "Action" in action:
-            action = action.split("Action")[-1].strip()
-            
+        for pattern in _ACTION_RES:
+            match = pattern.match(action)
+            if match:
+                action = match.group(1).strip()
+                break
+
+
         lower_action = action.lower()
             
-        is_valid = lower_action in self.language_action_space
-        valid_action = lower_action if is_valid else self.default_action
-        
-        total_but_occurrences = 0
-        for word in ["However", "different", "but", "wait", "won't", "can't", "cannot", "another"]:
-            total_but_occurrences += full_action.lower().count(word.lower())
+        is_valid = lower_action in self._action_set
+        # draw the random fallback direction only on the invalid path; valid
+        # steps (the common case) cost no RNG call or attribute store
+        valid_action = lower_action if is_valid else random.choice(self.all_posible_default_action)
         
+        total_but_occurrences = len(_BACKTRACK_RE.findall(full_action))
+
+
         metrics = {
-            "behavior/valid_action_ratio": is_valid * 1.0,
+            "behavior/valid_action_ratio": float(is_valid),
             "behavior/backtrack_length": total_but_occurrences
         }
         
@@ -7,11 +7,16 @@ from verl.envs.environments.nle import AutoMore, NLELanguageWrapper
 from verl.envs.environments.wrappers import GymV21CompatibilityV0, NLETimeLimit
 from verl.envs.environments.minihack.llm_agents_wrapper import MiniHackLLMAgentsWrapper
 
-MINIHACK_ENVS = []
-for env_spec in gym.envs.registry.all():
-    id = env_spec.id
-    if id.split("-")[0] == "MiniHack":
-        MINIHACK_ENVS.append(id)
+_MINIHACK_ENVS = None
+
+
+def get_minihack_envs():
+    # Walking the full gym registry is wasteful at import time (it would run
+    # again in every forked env worker); scan lazily on first use and cache.
+    global _MINIHACK_ENVS
+    if _MINIHACK_ENVS is None:
+        _MINIHACK_ENVS = [env_spec.id for env_spec in gym.envs.registry.all() if env_spec.id.startswith("MiniHack-")]
+    return _MINIHACK_ENVS
 
 
 def make_minihack_env(env_name, task, config, render_mode: Optional[str] = None):
@@ -39,6 +44,6 @@ def make_minihack_env(env_name, task, config, render_mode: Optional[str] = None)
     env = NLETimeLimit(env)
 
     env = GymV21CompatibilityV0(env=env, render_mode=render_mode)
-    env = MiniHackLLMAgentsWrapper(env)
+    env = MiniHackLLMAgentsWrapper(env, **config.envs)
 
     return env
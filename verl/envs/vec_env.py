@@ -3,18 +3,31 @@
 
 import numpy as np
 import torch
-from multiprocessing import Process, Pipe
+from multiprocessing import Process, Pipe, shared_memory
+from multiprocessing.connection import wait
+import pickle
 import random
 
-from collections import defaultdict
+# Payload-less commands are identical for every worker; pickle them once and
+# push the raw bytes (Connection.recv on the worker side unpickles either way).
+_RESET_MSG = pickle.dumps(('reset', None))
+_RENDER_MSG = pickle.dumps(('render', None))
+_CLOSE_MSG = pickle.dumps(('close', None))
 
 def merge_metrics(infos):
-    merged_infos = defaultdict(list)
+    # metric values are scalars and there are only n_rollouts of them per key,
+    # so plain float accumulators beat numpy dispatch at this size
+    sums = {}
+    counts = {}
     for info in infos:
         for key, value in info["metrics"].items():
-            merged_infos[key].append(value)
-    merged_infos = {key: np.mean(values) for key, values in merged_infos.items()}
-    return merged_infos
+            if key in sums:
+                sums[key] += value
+                counts[key] += 1
+            else:
+                sums[key] = value
+                counts[key] = 1
+    return {key: sums[key] / counts[key] for key in sums}
 
 
 class CloudpickleWrapper(object):
@@ -22,6 +35,8 @@ class CloudpickleWrapper(object):
     Uses cloudpickle to serialize contents (otherwise multiprocessing tries to use pickle)
     """
 
+    __slots__ = ("x",)
+
     def __init__(self, x):
         self.x = x
 
@@ -40,13 +55,23 @@ class VecEnv:
         self.config = config
         self.n_rollouts = config.envs.n_rollouts
         assert len(env_fns) == self.n_rollouts, "Number of env_fns must match n_rollouts"
-        
+
+        # The numeric step results live in shared memory: each worker writes its
+        # slot in place, so rewards/terminated/truncated never go through the
+        # pickle+pipe round-trip. Only obs/info dicts are sent over the Pipe.
+        self._shm = shared_memory.SharedMemory(create=True, size=self.n_rollouts * 6)
+        self._rews = np.ndarray((self.n_rollouts,), dtype=np.float32, buffer=self._shm.buf)
+        self._terminated = np.ndarray((self.n_rollouts,), dtype=np.bool_, buffer=self._shm.buf, offset=4 * self.n_rollouts)
+        self._truncated = np.ndarray((self.n_rollouts,), dtype=np.bool_, buffer=self._shm.buf, offset=5 * self.n_rollouts)
+
         self.remotes, self.work_remotes = zip(*[Pipe() for _ in range(self.n_rollouts)])
+        self._remote_idx = {remote: rank for rank, remote in enumerate(self.remotes)}
         self.processes = []
         for rank, (work_remote, remote, env_fn, captioner_fn) in enumerate(zip(self.work_remotes, self.remotes, env_fns, captioner_fns)):
             p = Process(
                 target=worker,
-                args=(rank, work_remote, remote, env_name, CloudpickleWrapper(env_fn), CloudpickleWrapper(captioner_fn)),
+                args=(rank, work_remote, remote, env_name, CloudpickleWrapper(env_fn), CloudpickleWrapper(captioner_fn),
+                      self._shm.name, self.n_rollouts),
             )
             p.daemon = True  # if the main process crashes, we should not cause things to hang
             p.start()
@@ -55,43 +80,73 @@ class VecEnv:
         for remote in self.work_remotes:
             remote.close()
             
-    def step(self, actions):
+    def _recv_all(self):
+        # drain the pipes in completion order instead of blocking on rank 0,
+        # so parent-side deserialization overlaps with the slower workers
+        results = [None] * self.n_rollouts
+        pending = list(self.remotes)
+        while pending:
+            for remote in wait(pending):
+                results[self._remote_idx[remote]] = remote.recv()
+                pending.remove(remote)
+        return results
+
+    def step_async(self, actions):
+        # dispatch only; callers can do host-side work while the workers step
         for remote, action in zip(self.remotes, actions):
             remote.send(('step', action))
-        results = [remote.recv() for remote in self.remotes]
-        obs, rews, terminated, truncated, infos = zip(*results)
-        
+
+    def step_wait(self):
+        obs, infos = zip(*self._recv_all())
+
         infos = merge_metrics(infos)
-        
-        return obs, np.stack(rews), np.stack(terminated), np.stack(truncated), infos
+
+        # copy the shared slots so callers can hold onto the arrays across steps
+        return obs, self._rews.copy(), self._terminated.copy(), self._truncated.copy(), infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
     
     def reset(self):
         for remote in self.remotes:
-            remote.send(('reset', None))
-        observations, infos = zip(*[remote.recv() for remote in self.remotes])
+            remote.send_bytes(_RESET_MSG)
+        observations, infos = zip(*self._recv_all())
         return observations, infos
     
     def render(self):
         for remote in self.remotes:
-            remote.send(('render', None))
+            remote.send_bytes(_RENDER_MSG)
         images = [remote.recv() for remote in self.remotes]
         return images
 
     def close(self):
         for remote in self.remotes:
-            remote.send(('close', None))
- 
+            remote.send_bytes(_CLOSE_MSG)
+        # wait for workers to detach their shared-memory views before the
+        # segment is unlinked
+        for p in self.processes:
+            p.join()
+        self._shm.close()
+        self._shm.unlink()
+
 
     
-def worker(rank, remote, parent_remote, env_name, env_fn_wrapper, captioner_fn_wrapper):
-    
+def worker(rank, remote, parent_remote, env_name, env_fn_wrapper, captioner_fn_wrapper, shm_name, n_rollouts):
+
     random.seed(rank)
     np.random.seed(rank)
-    
+
     parent_remote.close()
     env = env_fn_wrapper.x()
     captioner = captioner_fn_wrapper.x()
     image = None
+
+    # attach the shared numeric result arrays and write only our slot
+    shm = shared_memory.SharedMemory(name=shm_name)
+    shared_rews = np.ndarray((n_rollouts,), dtype=np.float32, buffer=shm.buf)
+    shared_terminated = np.ndarray((n_rollouts,), dtype=np.bool_, buffer=shm.buf, offset=4 * n_rollouts)
+    shared_truncated = np.ndarray((n_rollouts,), dtype=np.bool_, buffer=shm.buf, offset=5 * n_rollouts)
     
     def env_step(action):
         full_action, executed_action, is_valid, metrics = env.extract_action(action)
@@ -113,24 +168,36 @@ def worker(rank, remote, parent_remote, env_name, env_fn_wrapper, captioner_fn_w
         captioner.prompt_builder.update_instruction_prompt(inst_prompt)
         return captioner.get_obs(env_obs), info, image
         
+    def handle_step(data):
+        nonlocal image
+        obs, reward, terminated, truncated, info, image = env_step(data)
+        if terminated or truncated:
+            obs, _, image = env_reset()
+        shared_rews[rank] = reward
+        shared_terminated[rank] = terminated
+        shared_truncated[rank] = truncated
+        remote.send((obs, info))
+
+    def handle_reset(data):
+        nonlocal image
+        obs, info, image = env_reset()
+        remote.send((obs, info))
+
+    def handle_render(data):
+        remote.send(image)
+
+    # dict dispatch instead of walking the cmd if/elif chain every message;
+    # unknown commands fail loudly with a KeyError
+    handlers = {'step': handle_step, 'reset': handle_reset, 'render': handle_render}
+
     while True:
         cmd, data = remote.recv()
-        if cmd == 'step':
-            obs, reward, terminated, truncated, info, image = env_step(data)
-            if terminated or truncated:
-                obs, _, image = env_reset()
-            remote.send((obs, reward, terminated, truncated, info))
-        elif cmd == 'reset':
-            obs, info, image = env_reset()
-            remote.send((obs, info))
-        elif cmd == 'render':
-            remote.send(image)
-        elif cmd == 'close':
+        if cmd == 'close':
             env.close()
+            shm.close()
             remote.close()
             break
-        else:
-            raise NotImplementedError
+        handlers[cmd](data)
 
         
   
@@ -69,7 +69,13 @@ def process_item(reward_fn, data_source, response_lst, reward_data):
 @hydra.main(config_path='config', config_name='evaluation', version_base=None)
 def main(config):
     local_path = copy_to_local(config.data.path)
-    dataset = pd.read_parquet(local_path)
+    # Only materialize the columns we actually read below, so pyarrow can skip
+    # the remaining column chunks entirely (projection pushdown).
+    dataset = pd.read_parquet(local_path,
+                              columns=[
+                                  config.data.prompt_key, config.data.response_key, config.data.data_source_key,
+                                  config.data.reward_model_key
+                              ])
     prompts = dataset[config.data.prompt_key]
     responses = dataset[config.data.response_key]
     data_sources = dataset[config.data.data_source_key]
@@ -65,7 +65,8 @@ def main_task(config):
         assert config.data.n_samples == 1, 'When temperature=0, n_samples must be 1.'
 
     # read dataset. Note that the dataset should directly contain chat template format (e.g., a list of dictionary)
-    dataset = pd.read_parquet(config.data.path)
+    # Only the prompt column is used, so project it at read time to avoid decoding the other columns.
+    dataset = pd.read_parquet(config.data.path, columns=[config.data.prompt_key])
     chat_lst = dataset[config.data.prompt_key].tolist()
 
     chat_lst = [chat.tolist() for chat in chat_lst]
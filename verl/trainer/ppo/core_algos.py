@@ -63,6 +63,54 @@ def get_kl_controller(kl_ctrl):
         raise NotImplementedError
 
 
+@torch.jit.script
+def _gae_recurrence(batch_rewards: torch.Tensor, batch_values: torch.Tensor, batch_dones: torch.Tensor,
+                    batch_response_mask: torch.Tensor, token_gamma: float, step_gamma: float, token_lam: float,
+                    step_lam: float) -> torch.Tensor:
+    """Reverse-time GAE recurrence over (episode_len, n_rollouts, gen_len) tensors.
+
+    Scripted so the tight double loop runs without per-op Python dispatch and
+    writes into one preallocated advantages tensor. The final episode step is
+    left zero as a placeholder; it is discarded during policy training.
+    """
+    episode_len, n_rollouts, gen_len = batch_values.shape
+    advantages = torch.zeros_like(batch_values)
+
+    ones = torch.ones(n_rollouts, dtype=batch_values.dtype, device=batch_values.device)
+    gae = torch.zeros(n_rollouts, dtype=batch_values.dtype, device=batch_values.device)
+    next_values = batch_values[episode_len - 1, :, 0]
+
+    for env_t in range(episode_len - 2, -1, -1):
+        gamma = step_gamma * ones
+        lam = step_lam * ones
+        done_t = batch_dones[env_t]  # done=1, not done=0
+        gae = (1 - done_t) * gae
+
+        for token_t in range(gen_len - 1, -1, -1):
+
+            rew_t = batch_rewards[env_t, :, token_t]
+            v_t = batch_values[env_t, :, token_t]
+
+            # response (need gradient update) = 1, pad_token = 0
+            # Note that in critic trainer, response_mask = attention_mask[:, -response_length - 1:-1]
+            # While in ray_trainer and here, response_mask = attention_mask[:, -response_length:]
+            if token_t == 0:
+                update_t = ones
+            else:
+                update_t = batch_response_mask[env_t, :, token_t - 1]
+
+            delta = rew_t + gamma * next_values * (1 - done_t) - v_t
+            gae = (delta + gamma * lam * gae) * update_t + gae * (1 - update_t)
+            advantages[env_t, :, token_t] = gae * update_t
+
+            next_values = v_t * update_t + next_values * (1 - update_t)
+            done_t = done_t * (1 - update_t)  # only mask the last token in the sequence (env done)
+            gamma = token_gamma * update_t + step_gamma * (1 - update_t)  # use step gamma only for the last token
+            lam = token_lam * update_t + step_lam * (1 - update_t)  # use step lambda only for the last token
+
+    return advantages
+
+
 def compute_gae_advantage_return(
         token_level_rewards: torch.Tensor, 
         values: torch.Tensor,
@@ -102,54 +150,15 @@ def compute_gae_advantage_return(
 
     """
     with torch.no_grad():
-        
-        _, gen_len = values.shape        
+
+        _, gen_len = values.shape
         batch_values = values.reshape(-1, n_rollouts, gen_len)
         batch_rewards = token_level_rewards.reshape(-1, n_rollouts, gen_len)
         batch_dones = dones.reshape(-1, n_rollouts)
         batch_response_mask = response_mask.reshape(-1, n_rollouts, gen_len)
-        
-        episode_len, _, gen_len = batch_values.shape
-        
-        # Placeholder for the final step of the episode.
-        # This step will be discarded during policy training.
-        all_advantages_reversed = [torch.zeros_like(batch_values[0])]
-        
-        gae = 0
-        next_values = batch_values[episode_len-1, :, 0]
-        
-        for env_t in reversed(range(episode_len - 1)):
-            advantages_reversed = []
-            
-            gamma = step_gamma
-            lam = step_lam
-            done_t = batch_dones[env_t] # done=1, not done=0
-            gae = (1 - done_t) * gae
-            
-            for token_t in reversed(range(gen_len)):
-                
-                rew_t = batch_rewards[env_t, :, token_t]
-                v_t = batch_values[env_t, :, token_t]
-                
-                # response (need gradient update) = 1, pad_token = 0 
-                # Note that in critic trainer, response_mask = attention_mask[:, -response_length - 1:-1]
-                # While in ray_trainer and here, response_mask = attention_mask[:, -response_length:]
-                update_t = 1 if token_t == 0 else batch_response_mask[env_t, :, token_t-1]
-                
-                delta = rew_t + gamma * next_values * (1 - done_t) - v_t
-                gae = (delta + gamma * lam * gae) * update_t + gae * (1 - update_t)
-                advantages_reversed.append(gae * update_t)
-                
-                next_values = v_t * update_t + next_values * (1 - update_t)
-                done_t = done_t * (1 - update_t) # only mask the last token in the sequence (env done)
-                gamma = token_gamma * update_t + step_gamma * (1 - update_t) # use step gamma only for the last token
-                lam = token_lam * update_t + step_lam * (1 - update_t) # use step lambda only for the last token
-                
-            advantages_reversed = torch.stack(advantages_reversed, dim=-1)
-            step_advantage = torch.flip(advantages_reversed, dims=[-1])
-            all_advantages_reversed.append(step_advantage)
-        all_advantages_reversed = torch.stack(all_advantages_reversed, dim=0)
-        all_advantages = torch.flip(all_advantages_reversed, dims=[0])
+
+        all_advantages = _gae_recurrence(batch_rewards, batch_values, batch_dones, batch_response_mask,
+                                         float(token_gamma), float(step_gamma), float(token_lam), float(step_lam))
         advantages = all_advantages.reshape(-1, gen_len)
         returns = advantages + values
         advantages = verl_F.masked_whiten(advantages, response_mask)
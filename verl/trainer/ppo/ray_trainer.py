@@ -16,9 +16,10 @@ FSDP PPO Trainer with Ray-based single controller.
 This trainer supports model-agonistic model initialization with huggingface
 """
 
+import itertools
 import os
-import uuid
 import warnings
+import weakref
 from contextlib import contextmanager
 from dataclasses import dataclass, field
 from enum import Enum
@@ -41,7 +42,7 @@ from verl.single_controller.ray.base import create_colocated_worker_cls
 from verl.trainer.ppo import core_algos
 from verl.trainer.ppo.metric_utils import compute_data_metrics, compute_throughout_metrics, compute_timing_metrics, reduce_metrics, bootstrap_metric, calc_maj_val, process_validation_metrics
 from verl.utils.seqlen_balancing import get_seqlen_balanced_partitions, log_seqlen_unbalance
-from verl.utils.checkpoint.checkpoint_manager import find_latest_ckpt_path
+from verl.utils.checkpoint.checkpoint_manager import find_latest_ckpt_path, torch_load_maybe_mmap
 from verl.utils.dataset.rl_dataset import RLHFDataset, collate_fn
 from verl.utils.tracking import ValidationGenerationsLogger
 from torch.utils.data import Dataset, RandomSampler, SequentialSampler
@@ -75,6 +76,13 @@ class AdvantageEstimator(str, Enum):
     RLOO = 'rloo'
 
 
+# Pools keyed by (process_on_nodes, name_prefix); creating a RayResourcePool
+# places Ray placement groups, which can take seconds, so re-inits within the
+# same driver (e.g. hyperparameter sweeps) reuse live pools. Weak values let a
+# pool die with its last manager instead of pinning the placement groups.
+_RESOURCE_POOL_CACHE = weakref.WeakValueDictionary()
+
+
 @dataclass
 class ResourcePoolManager:
     """
@@ -85,15 +93,25 @@ class ResourcePoolManager:
     mapping: dict[Role, str]
     resource_pool_dict: dict[str, RayResourcePool] = field(default_factory=dict)
 
+    def __post_init__(self):
+        # the spec is fixed after construction, so the cluster-wide GPU total
+        # is computed once instead of on every get_n_gpus call
+        self._n_gpus_total = sum(
+            n_gpus for process_on_nodes in self.resource_pool_spec.values() for n_gpus in process_on_nodes)
+
     def create_resource_pool(self):
         for resource_pool_name, process_on_nodes in self.resource_pool_spec.items():
-            # max_colocate_count means the number of WorkerGroups (i.e. processes) in each RayResourcePool
-            # For FSDP backend, we recommend using max_colocate_count=1 that merge all WorkerGroups into one.
-            # For Megatron backend, we recommend using max_colocate_count>1 that can utilize different WorkerGroup for differnt models
-            resource_pool = RayResourcePool(process_on_nodes=process_on_nodes,
-                                            use_gpu=True,
-                                            max_colocate_count=1,
-                                            name_prefix=resource_pool_name)
+            cache_key = (tuple(process_on_nodes), resource_pool_name)
+            resource_pool = _RESOURCE_POOL_CACHE.get(cache_key)
+            if resource_pool is None:
+                # max_colocate_count means the number of WorkerGroups (i.e. processes) in each RayResourcePool
+                # For FSDP backend, we recommend using max_colocate_count=1 that merge all WorkerGroups into one.
+                # For Megatron backend, we recommend using max_colocate_count>1 that can utilize different WorkerGroup for differnt models
+                resource_pool = RayResourcePool(process_on_nodes=process_on_nodes,
+                                                use_gpu=True,
+                                                max_colocate_count=1,
+                                                name_prefix=resource_pool_name)
+                _RESOURCE_POOL_CACHE[cache_key] = resource_pool
             self.resource_pool_dict[resource_pool_name] = resource_pool
 
         self._check_resource_available()
@@ -104,7 +122,7 @@ class ResourcePoolManager:
 
     def get_n_gpus(self) -> int:
         """Get the number of gpus in this cluster."""
-        return sum([n_gpus for process_on_nodes in self.resource_pool_spec.values() for n_gpus in process_on_nodes])
+        return self._n_gpus_total
 
     def _check_resource_available(self):
         """Check if the resource pool can be satisfied in this ray cluster."""
@@ -113,8 +131,7 @@ class ResourcePoolManager:
 
         # check total required gpus can be satisfied
         total_available_gpus = sum(node_available_gpus.values())
-        total_required_gpus = sum(
-            [n_gpus for process_on_nodes in self.resource_pool_spec.values() for n_gpus in process_on_nodes])
+        total_required_gpus = self._n_gpus_total
         if total_available_gpus < total_required_gpus:
             raise ValueError(
                 f"Total available GPUs {total_available_gpus} is less than total desired GPUs {total_required_gpus}")
@@ -138,6 +155,19 @@ import torch
 from verl.utils.torch_functional import masked_mean
 
 
+@torch.compile(dynamic=True)
+def _fused_kl_penalty(kld, response_mask, token_level_scores, beta):
+    """Fused elementwise half of apply_kl_penalty.
+
+    Compiled so the mask, scale, subtract and masked mean run as one kernel
+    instead of materializing each intermediate tensor.
+    """
+    kld = kld * response_mask
+    token_level_rewards = token_level_scores - beta * kld
+    current_kl = masked_mean(kld, mask=response_mask, axis=-1)  # average over sequence
+    return token_level_rewards, torch.mean(current_kl, dim=0)
+
+
 def apply_kl_penalty(data: DataProto, kl_ctrl: core_algos.AdaptiveKLController, kl_penalty='kl'):
     responses = data.batch['responses']
     response_length = responses.size(1)
@@ -150,13 +180,11 @@ def apply_kl_penalty(data: DataProto, kl_ctrl: core_algos.AdaptiveKLController,
     # When apply_kl_penalty, algorithm.use_kl_in_reward=True, so the reference model has been enabled.
     kld = core_algos.kl_penalty(data.batch['old_log_probs'], data.batch['ref_log_prob'],
                                 kl_penalty=kl_penalty)  # (batch_size, response_length)
-    kld = kld * response_mask
     beta = kl_ctrl.value
 
-    token_level_rewards = token_level_scores - beta * kld
-
-    current_kl = masked_mean(kld, mask=response_mask, axis=-1)  # average over sequence
-    current_kl = torch.mean(current_kl, dim=0).item()
+    token_level_rewards, current_kl = _fused_kl_penalty(kld, response_mask, token_level_scores, beta)
+    # single host sync; kl_ctrl.update and the metrics need the python float
+    current_kl = current_kl.item()
 
     # according to https://github.com/huggingface/trl/blob/951ca1841f29114b969b57b26c7d3e80a39f75a0/trl/trainer/ppo_trainer.py#L837
     kl_ctrl.update(current_kl=current_kl, n_steps=batch_size)
@@ -170,6 +198,33 @@ def apply_kl_penalty(data: DataProto, kl_ctrl: core_algos.AdaptiveKLController,
     return data, metrics
 
 
+# shared generator for per-row uids; one bulk draw replaces a python loop of
+# uuid4 calls (each its own urandom read plus string formatting)
+_UID_RNG = np.random.default_rng()
+
+
+def _generate_uids(n):
+    """Generate ``n`` random 128-bit hex ids in one draw from the module rng."""
+    raw = _UID_RNG.bytes(16 * n)
+    return np.array([raw[i * 16:(i + 1) * 16].hex() for i in range(n)], dtype=object)
+
+
+def _accumulate_traj(rew_of_traj, len_of_traj, end_of_traj, reward, terminated, truncated):
+    """Fused in-place per-step trajectory accumulation for validation rollouts.
+
+    Accumulates reward/length only for rollouts whose trajectory has not ended
+    yet, then folds this step's terminations into ``end_of_traj``. ``reward``
+    is the per-step copy handed out by ``VecEnv.step`` and is consumed in
+    place, so the only temporary left is the n_rollouts-byte active mask.
+    """
+    active = ~end_of_traj
+    reward *= active
+    rew_of_traj += reward
+    len_of_traj += active
+    np.logical_or(end_of_traj, terminated, out=end_of_traj)
+    np.logical_or(end_of_traj, truncated, out=end_of_traj)
+
+
 def compute_response_mask(data: DataProto):
     responses = data.batch['responses']
     response_length = responses.size(1)
@@ -177,64 +232,84 @@ def compute_response_mask(data: DataProto):
     return attention_mask[:, -response_length:]
 
 
+def _compute_gae_advantage(data, kwargs):
+    return core_algos.compute_gae_advantage_return(
+        token_level_rewards=data.batch['token_level_rewards'],
+        values=data.batch['values'],
+        response_mask=data.batch['response_mask'],
+        token_gamma=kwargs['token_gamma'],
+        step_gamma=kwargs['step_gamma'],
+        dones=data.batch['done'],
+        token_lam=kwargs['token_lam'],
+        step_lam=kwargs['step_lam'],
+        n_rollouts=kwargs['n_rollouts'])
+
+
+def _compute_grpo_advantage(data, kwargs):
+    return core_algos.compute_grpo_outcome_advantage(
+        token_level_rewards=data.batch['token_level_rewards'],
+        response_mask=data.batch['response_mask'],
+        index=data.non_tensor_batch['uid'])
+
+
+def _compute_reinforce_plus_plus_baseline_advantage(data, kwargs):
+    return core_algos.compute_reinforce_plus_plus_baseline_outcome_advantage(
+        token_level_rewards=data.batch['token_level_rewards'],
+        response_mask=data.batch['response_mask'],
+        index=data.non_tensor_batch['uid'])
+
+
+def _compute_reinforce_plus_plus_advantage(data, kwargs):
+    return core_algos.compute_reinforce_plus_plus_outcome_advantage(
+        token_level_rewards=data.batch['token_level_rewards'],
+        response_mask=data.batch['response_mask'],
+        gamma=kwargs['token_gamma'])
+
+
+def _compute_remax_advantage(data, kwargs):
+    return core_algos.compute_remax_outcome_advantage(
+        token_level_rewards=data.batch['token_level_rewards'],
+        reward_baselines=data.batch['reward_baselines'],
+        response_mask=data.batch['response_mask'])
+
+
+def _compute_rloo_advantage(data, kwargs):
+    return core_algos.compute_rloo_outcome_advantage(
+        token_level_rewards=data.batch['token_level_rewards'],
+        response_mask=data.batch['response_mask'],
+        index=data.non_tensor_batch['uid'])
+
+
+# estimator dispatch table; one dict lookup replaces the if/elif chain that
+# compared against every enum member per call
+_ADV_ESTIMATOR_FNS = {
+    AdvantageEstimator.GAE: _compute_gae_advantage,
+    AdvantageEstimator.GRPO: _compute_grpo_advantage,
+    AdvantageEstimator.REINFORCE_PLUS_PLUS_BASELINE: _compute_reinforce_plus_plus_baseline_advantage,
+    AdvantageEstimator.REINFORCE_PLUS_PLUS: _compute_reinforce_plus_plus_advantage,
+    AdvantageEstimator.REMAX: _compute_remax_advantage,
+    AdvantageEstimator.RLOO: _compute_rloo_advantage,
+}
+
+
 def compute_advantage(data: DataProto, adv_estimator, step_gamma=1.0, step_lam=1.0, token_gamma=1.0, token_lam=1.0, n_rollouts=1):
     # Back-compatible with trainers that do not compute response mask in fit
-    if "response_mask" not in data.batch.keys():
+    if "response_mask" not in data.batch:
         data.batch['response_mask'] = compute_response_mask(data)
-    # prepare response group
-    # TODO: add other ways to estimate advantages
-    if adv_estimator == AdvantageEstimator.GAE:
-        values = data.batch['values']
-        advantages, returns = core_algos.compute_gae_advantage_return(
-            token_level_rewards=data.batch['token_level_rewards'],
-            values=data.batch['values'],
-            response_mask=data.batch['response_mask'],
-            token_gamma=token_gamma,
-            step_gamma=step_gamma, 
-            dones=data.batch['done'], 
-            token_lam=token_lam,
-            step_lam=step_lam, 
-            n_rollouts=n_rollouts)
-        data.batch['advantages'] = advantages
-        data.batch['returns'] = returns
-    elif adv_estimator == AdvantageEstimator.GRPO:
-        advantages, returns = core_algos.compute_grpo_outcome_advantage(
-            token_level_rewards=data.batch['token_level_rewards'],
-            response_mask=data.batch['response_mask'],
-            index=data.non_tensor_batch['uid'])
-        data.batch['advantages'] = advantages
-        data.batch['returns'] = returns
-    elif adv_estimator == AdvantageEstimator.REINFORCE_PLUS_PLUS_BASELINE:
-        advantages, returns = core_algos.compute_reinforce_plus_plus_baseline_outcome_advantage(
-            token_level_rewards=data.batch['token_level_rewards'],
-            response_mask=data.batch['response_mask'],
-            index=data.non_tensor_batch['uid'])
-        data.batch['advantages'] = advantages
-        data.batch['returns'] = returns
-    elif adv_estimator == AdvantageEstimator.REINFORCE_PLUS_PLUS:
-        advantages, returns = core_algos.compute_reinforce_plus_plus_outcome_advantage(
-            token_level_rewards=data.batch['token_level_rewards'],
-            response_mask=data.batch['response_mask'],
-            gamma=gamma)
-        data.batch['advantages'] = advantages
-        data.batch['returns'] = returns
-    elif adv_estimator == AdvantageEstimator.REMAX:
-        advantages, returns = core_algos.compute_remax_outcome_advantage(
-            token_level_rewards=data.batch['token_level_rewards'],
-            reward_baselines=data.batch['reward_baselines'],
-            response_mask=data.batch['response_mask'])
-
-        data.batch['advantages'] = advantages
-        data.batch['returns'] = returns
-    elif adv_estimator == AdvantageEstimator.RLOO:
-        advantages, returns = core_algos.compute_rloo_outcome_advantage(
-            token_level_rewards=data.batch['token_level_rewards'],
-            response_mask=data.batch['response_mask'],
-            index=data.non_tensor_batch['uid'])
-        data.batch['advantages'] = advantages
-        data.batch['returns'] = returns
-    else:
+    try:
+        estimator_fn = _ADV_ESTIMATOR_FNS[adv_estimator]
+    except KeyError:
         raise NotImplementedError
+    advantages, returns = estimator_fn(
+        data, {
+            'step_gamma': step_gamma,
+            'step_lam': step_lam,
+            'token_gamma': token_gamma,
+            'token_lam': token_lam,
+            'n_rollouts': n_rollouts,
+        })
+    data.batch['advantages'] = advantages
+    data.batch['returns'] = returns
     return data
 
 
@@ -245,6 +320,40 @@ def _timer(name: str, timing_raw: Dict[str, float]):
     timing_raw[name] = timer.last
 
 
+# Mapping from config section to its deprecated micro-batch-size knob; built
+# once at import instead of on every check_mutually_exclusive call.
+_MICRO_BATCH_SETTINGS = {
+    "actor_rollout_ref.actor": "micro_batch_size",
+    "critic": "micro_batch_size",
+    "reward_model": "micro_batch_size",
+    "actor_rollout_ref.ref": "log_prob_micro_batch_size",
+    "actor_rollout_ref.rollout": "log_prob_micro_batch_size",
+}
+
+# Configs (by yaml hash) that already passed _validate_config; re-inits under
+# sweeps with an unchanged config skip the whole validation pass.
+_VALIDATED_CONFIG_HASHES = set()
+
+
+def check_mutually_exclusive(mbs, mbs_per_gpu, name: str):
+    """Check that "micro_batch_size" and "micro_batch_size_per_gpu" are not both set.
+
+    We throw an error if the user sets both. The new convention is "..._micro_batch_size_per_gpu".
+    """
+    if name in _MICRO_BATCH_SETTINGS:
+        param = _MICRO_BATCH_SETTINGS[name]
+        param_per_gpu = f"{param}_per_gpu"
+
+        if mbs is None and mbs_per_gpu is None:
+            raise ValueError(f"[{name}] Please set at least one of '{name}.{param}' or '{name}.{param_per_gpu}'.")
+
+        if mbs is not None and mbs_per_gpu is not None:
+            raise ValueError(
+                f"[{name}] You have set both '{name}.{param}' AND '{name}.{param_per_gpu}'. "
+                f"Please remove '{name}.{param}' because only '*_{param_per_gpu}' is supported (the former is deprecated)."
+            )
+
+
 class RayPPOTrainer(object):
     """
     Note that this trainer runs on the driver process on a single CPU/GPU node.
@@ -270,6 +379,13 @@ class RayPPOTrainer(object):
         self.reward_fn = reward_fn
         self.val_reward_fn = val_reward_fn
 
+        # warm the tokenizer's jinja chat-template cache up front so the first
+        # rollout/validation step does not pay the template compilation
+        if getattr(tokenizer, "chat_template", None) is not None:
+            tokenizer.apply_chat_template([{"role": "user", "content": ""}],
+                                          tokenize=False,
+                                          add_generation_prompt=True)
+
         self.hybrid_engine = config.actor_rollout_ref.hybrid_engine
         assert self.hybrid_engine, 'Currently, only support hybrid engine'
 
@@ -337,6 +453,13 @@ class RayPPOTrainer(object):
 
     def _validate_config(self):
         config = self.config
+
+        # an identical config has nothing new to validate; skip the whole pass
+        # when a sweep re-inits the trainer with an unchanged config
+        cfg_hash = hash((OmegaConf.to_yaml(config), self.use_reference_policy, self.use_critic))
+        if cfg_hash in _VALIDATED_CONFIG_HASHES:
+            return
+
         # number of GPUs total
         n_gpus = config.trainer.n_gpus_per_node * config.trainer.nnodes
 
@@ -345,31 +468,6 @@ class RayPPOTrainer(object):
         assert real_train_batch_size % n_gpus == 0, \
             f"real_train_batch_size ({real_train_batch_size}) must be divisible by total n_gpus ({n_gpus})."
 
-        # A helper function to check "micro_batch_size" vs "micro_batch_size_per_gpu"
-        # We throw an error if the user sets both. The new convention is "..._micro_batch_size_per_gpu".
-        def check_mutually_exclusive(mbs, mbs_per_gpu, name: str):
-            settings = {
-                "actor_rollout_ref.actor": "micro_batch_size",
-                "critic": "micro_batch_size",
-                "reward_model": "micro_batch_size",
-                "actor_rollout_ref.ref": "log_prob_micro_batch_size",
-                "actor_rollout_ref.rollout": "log_prob_micro_batch_size",
-            }
-
-            if name in settings:
-                param = settings[name]
-                param_per_gpu = f"{param}_per_gpu"
-
-                if mbs is None and mbs_per_gpu is None:
-                    raise ValueError(
-                        f"[{name}] Please set at least one of '{name}.{param}' or '{name}.{param_per_gpu}'.")
-
-                if mbs is not None and mbs_per_gpu is not None:
-                    raise ValueError(
-                        f"[{name}] You have set both '{name}.{param}' AND '{name}.{param_per_gpu}'. "
-                        f"Please remove '{name}.{param}' because only '*_{param_per_gpu}' is supported (the former is deprecated)."
-                    )
-
         if not config.actor_rollout_ref.actor.use_dynamic_bsz:
             # actor: ppo_micro_batch_size vs. ppo_micro_batch_size_per_gpu
             check_mutually_exclusive(config.actor_rollout_ref.actor.ppo_micro_batch_size,
@@ -446,6 +544,7 @@ class RayPPOTrainer(object):
             assert config.actor_rollout_ref.rollout.temperature > 0, \
                 "validation gen temperature should be greater than 0 when enabling do_sample"
 
+        _VALIDATED_CONFIG_HASHES.add(cfg_hash)
         print("[validate_config] All configuration checks passed successfully!")
 
     def _create_dataloader(self):
@@ -459,12 +558,15 @@ class RayPPOTrainer(object):
         else:
             dataset_cls = RLHFDataset
 
-        self.train_dataset = dataset_cls(
-            data_files=self.config.data.train_files,
-            tokenizer=self.tokenizer,
-            processor=self.processor,
-            config=self.config.data,
-        )
+        def _make_dataset(data_files):
+            return dataset_cls(
+                data_files=data_files,
+                tokenizer=self.tokenizer,
+                processor=self.processor,
+                config=self.config.data,
+            )
+
+        self.train_dataset = _make_dataset(self.config.data.train_files)
 
         # use sampler for better ckpt resume
         if self.config.data.shuffle:
@@ -480,20 +582,27 @@ class RayPPOTrainer(object):
                                                    num_workers=8,
                                                    drop_last=True,
                                                    collate_fn=collate_fn,
-                                                   sampler=sampler)
-
-        self.val_dataset = dataset_cls(
-            data_files=self.config.data.val_files,
-            tokenizer=self.tokenizer,
-            processor=self.processor,
-            config=self.config.data,
-        )
+                                                   sampler=sampler,
+                                                   # keep workers alive across epochs and stage batches in
+                                                   # pinned memory so H2D copies overlap compute
+                                                   persistent_workers=True,
+                                                   pin_memory=True,
+                                                   prefetch_factor=4)
+
+        # debugging runs often validate on the train files; reuse the parsed
+        # dataset instead of reading and tokenizing everything a second time
+        if self.config.data.val_files == self.config.data.train_files:
+            self.val_dataset = self.train_dataset
+        else:
+            self.val_dataset = _make_dataset(self.config.data.val_files)
         self.val_dataloader = StatefulDataLoader(
             dataset=self.val_dataset,
             # Validation datasets are sent to inference engines as a whole batch,
             # which will schedule the memory themselves.
             batch_size=len(self.val_dataset),
-            num_workers=8,
+            # the whole val set is a single batch; forked workers would load
+            # once and die, so read it in-process
+            num_workers=0,
             shuffle=False,
             drop_last=False,
             collate_fn=collate_fn)
@@ -527,18 +636,17 @@ class RayPPOTrainer(object):
         if generations_to_log == 0:
             return
 
-        import numpy as np
-
-        # Create tuples of (input, output, score) and sort by input text
-        samples = list(zip(inputs, outputs, scores))
-        samples.sort(key=lambda x: x[0])  # Sort by input text
+        # Sort by input text, then pick a deterministic random subset; argsort
+        # + one permutation of indices avoids building and shuffling the full
+        # list of (input, output, score) tuples
+        inputs = np.asarray(inputs, dtype=object)
+        outputs = np.asarray(outputs, dtype=object)
+        scores = np.asarray(scores, dtype=object)
+        order = np.argsort(inputs, kind='stable')
+        picked = np.random.RandomState(42).permutation(len(order))[:generations_to_log]
+        idx = order[picked]
 
-        # Use fixed random seed for deterministic shuffling
-        rng = np.random.RandomState(42)
-        rng.shuffle(samples)
-
-        # Take first N samples after shuffling
-        samples = samples[:generations_to_log]
+        samples = list(zip(inputs[idx], outputs[idx], scores[idx]))
 
         # Log to each configured logger
         self.validation_generations_logger.log(self.config.trainer.logger, samples, self.global_steps)
@@ -546,69 +654,89 @@ class RayPPOTrainer(object):
     def _validate(self):
 
         max_seq_len = self.config.data.max_prompt_length
+        log_generations = self.config.trainer.log_val_generations > 0
+        self.tokenizer.padding_side = "left"
         val_obs, val_info = self.val_env.reset()
-        
+
         # Lists to collect samples for the table
         sample_inputs = []
         sample_outputs = []
         sample_scores = []
-        end_of_traj = None
-        rew_of_traj = 0.
-        len_of_traj = 0.
+        n_steps = 0
+        # preallocate the trajectory accumulators once; every step then updates
+        # them in place instead of special-casing the first step
+        n_rollouts = self.config.envs.n_rollouts
+        end_of_traj = np.zeros(n_rollouts, dtype=np.bool_)
+        rew_of_traj = np.zeros(n_rollouts, dtype=np.float32)
+        len_of_traj = np.zeros(n_rollouts, dtype=np.float32)
         
-        while True:
-            
-            self.tokenizer.padding_side = "left"
-            val_input_obs_text = self.tokenizer.apply_chat_template(val_obs, tokenize=False, add_generation_prompt=True) #, enable_thinking=True)
-            sample_inputs.extend(val_input_obs_text)
-            val_input_obs = self.tokenizer(val_input_obs_text, return_tensors='pt', padding='max_length', truncation=True, max_length=max_seq_len)
-            input_ids = val_input_obs['input_ids']
-            attention_mask = val_input_obs['attention_mask']
-            position_ids = attention_mask.long().cumsum(-1) - 1
-            position_ids.masked_fill_(attention_mask == 0, 1)
-            
-            val_obs_data = {
-                'input_ids': input_ids,
-                'attention_mask': attention_mask,
-                'position_ids': position_ids,
-            }
-            val_gen_batch = DataProto.from_dict(tensors=val_obs_data)
-            
-            # val_gen_batch.meta_info = {
-            #     'eos_token_id': self.tokenizer.eos_token_id,
-            #     'pad_token_id': self.tokenizer.pad_token_id,
-            #     'recompute_log_prob': False,
-            #     'do_sample': self.config.actor_rollout_ref.rollout.val_kwargs.do_sample,
-            #     'validate': True,
-            # }
-            
-            val_gen_batch.meta_info["step"] = None
-            val_gen_batch_output = self.actor_rollout_wg.generate_sequences(val_gen_batch)
-                        
-            response_ids = val_gen_batch_output.batch['responses']
-            actions = self.tokenizer.batch_decode(response_ids, skip_special_tokens=True)
-            sample_outputs.extend(actions)
-            
-            val_obs, val_reward, val_terminated, val_truncated, val_info = self.val_env.step(actions)
-            
-            if end_of_traj is None:
-                end_of_traj = np.logical_or(val_terminated, val_truncated)
-                rew_of_traj = val_reward
-                len_of_traj = np.ones_like(val_reward)
-            else:
-                done = np.logical_or(val_terminated, val_truncated)
-                rew_of_traj += val_reward * (~end_of_traj).astype(np.float32)
-                len_of_traj += (~end_of_traj).astype(np.float32)
-                end_of_traj = np.logical_or(end_of_traj, done)
-            
-            sample_scores.extend(rew_of_traj)
-            
-            if end_of_traj.all():
-                break
+        # validation never backpropagates, so skip autograd bookkeeping for
+        # all driver-side tensor ops in the loop
+        with torch.inference_mode():
+            while True:
+
+                # render the prompt text only when generations are actually logged
+                if log_generations:
+                    sample_inputs.extend(self.tokenizer.apply_chat_template(val_obs, tokenize=False, add_generation_prompt=True))
+                # render + tokenize + pad in one fused call (same pattern as
+                # main_generation); longest-padding keeps short observations short
+                val_input_obs = self.tokenizer.apply_chat_template(val_obs,
+                                                                   add_generation_prompt=True,
+                                                                   padding='longest',
+                                                                   truncation=True,
+                                                                   max_length=max_seq_len,
+                                                                   return_tensors='pt',
+                                                                   return_dict=True,
+                                                                   tokenize=True)
+                input_ids = val_input_obs['input_ids']
+                attention_mask = val_input_obs['attention_mask']
+                position_ids = attention_mask.cumsum(-1, dtype=torch.int32).sub_(1)
+                position_ids.masked_fill_(attention_mask == 0, 1)
+                position_ids = position_ids.long()
+
+                val_obs_data = {
+                    'input_ids': input_ids,
+                    'attention_mask': attention_mask,
+                    'position_ids': position_ids,
+                }
+                val_gen_batch = DataProto.from_dict(tensors=val_obs_data)
+
+                # val_gen_batch.meta_info = {
+                #     'eos_token_id': self.tokenizer.eos_token_id,
+                #     'pad_token_id': self.tokenizer.pad_token_id,
+                #     'recompute_log_prob': False,
+                #     'do_sample': self.config.actor_rollout_ref.rollout.val_kwargs.do_sample,
+                #     'validate': True,
+                # }
+
+                val_gen_batch.meta_info["step"] = None
+                val_gen_batch_output = self.actor_rollout_wg.generate_sequences(val_gen_batch)
+
+                response_ids = val_gen_batch_output.batch['responses']
+                actions = self.tokenizer.batch_decode(response_ids, skip_special_tokens=True)
+
+                # dispatch the env step first so logging bookkeeping overlaps the
+                # worker-side stepping and captioning
+                self.val_env.step_async(actions)
+                if log_generations:
+                    sample_outputs.extend(actions)
+                n_steps += 1
+                val_obs, val_reward, val_terminated, val_truncated, val_info = self.val_env.step_wait()
+
+                _accumulate_traj(rew_of_traj, len_of_traj, end_of_traj, val_reward, val_terminated, val_truncated)
+
+                if end_of_traj.all():
+                    break
+
+        if log_generations:
+            # each step contributed one row per rollout, so tiling the final
+            # trajectory rewards keeps scores aligned with inputs/outputs; the
+            # old per-step extend logged the running reward, not the final one
+            sample_scores = np.tile(rew_of_traj, n_steps)
         
         self._maybe_log_val_generations(inputs=sample_inputs, outputs=sample_outputs, scores=sample_scores)
         
-        succ_of_traj = (np.array(rew_of_traj) > 0.) * 1.
+        succ_of_traj = (rew_of_traj > 0.) * 1.
         
         metric_dict = {
             "val-rewards": rew_of_traj.mean(),
@@ -729,13 +857,27 @@ class RayPPOTrainer(object):
         # save dataloader
         dataloader_local_path = os.path.join(local_global_step_folder, 'data.pt')
         dataloader_state_dict = self.train_dataloader.state_dict()
-        torch.save(dataloader_state_dict, dataloader_local_path)
+        # a large write buffer coalesces the many small pickle writes the
+        # iterator state produces into few syscalls; write to a tempfile and
+        # rename so a crash mid-write never leaves a torn data.pt behind
+        with open(dataloader_local_path + '.tmp', 'wb', buffering=4 * 1024 * 1024) as f:
+            torch.save(dataloader_state_dict, f)
+        os.replace(dataloader_local_path + '.tmp', dataloader_local_path)
+
+        # the workers persist their shards on background threads; the tracker
+        # must not advertise this step until every shard is on disk, otherwise
+        # a crash (or normal driver exit after the final save) leaves the
+        # tracker pointing at a checkpoint that does not exist
+        self.actor_rollout_wg.wait_for_checkpoint_save()
+        if self.use_critic:
+            self.critic_wg.wait_for_checkpoint_save()
 
         # latest checkpointed iteration tracker (for atomic usage)
         local_latest_checkpointed_iteration = os.path.join(self.config.trainer.default_local_dir,
                                                            'latest_checkpointed_iteration.txt')
-        with open(local_latest_checkpointed_iteration, 'w') as f:
+        with open(local_latest_checkpointed_iteration + '.tmp', 'w') as f:
             f.write(str(self.global_steps))
+        os.replace(local_latest_checkpointed_iteration + '.tmp', local_latest_checkpointed_iteration)
 
     def _load_checkpoint(self):
         if self.config.trainer.resume_mode == 'disable':
@@ -785,7 +927,7 @@ class RayPPOTrainer(object):
         # TODO: from remote not implemented yet
         dataloader_local_path = os.path.join(global_step_folder, 'data.pt')
         if os.path.exists(dataloader_local_path):
-            dataloader_state_dict = torch.load(dataloader_local_path, weights_only=False)
+            dataloader_state_dict = torch_load_maybe_mmap(dataloader_local_path, weights_only=False)
             self.train_dataloader.load_state_dict(dataloader_state_dict)
         else:
             print(f"Warning: No dataloader state found at {dataloader_local_path}, will start from scratch")
@@ -800,13 +942,51 @@ class RayPPOTrainer(object):
                                                               k_partitions=world_size,
                                                               equal_size=True)
         # reorder based on index. The data will be automatically equally partitioned by dispatch function
-        global_idx = torch.tensor([j for partition in global_partition_lst for j in partition])
+        # fromiter fills the preallocated index array straight from the chained
+        # partitions, skipping the intermediate python list of ints
+        global_idx = torch.from_numpy(
+            np.fromiter(itertools.chain.from_iterable(global_partition_lst), dtype=np.int64, count=batch_size))
         batch.reorder(global_idx)
         global_balance_stats = log_seqlen_unbalance(seqlen_list=global_seqlen_lst,
                                                     partitions=global_partition_lst,
                                                     prefix=logging_prefix)
         metrics.update(global_balance_stats)
 
+    def _get_batch_buffers(self, bsize, esize):
+        """Return the reusable rollout collection buffers for ``fit``.
+
+        The collection batch is hundreds of MB of tensors per step; allocating
+        it fresh every iteration thrashes the allocator, so the buffers are
+        created once per (bsize, esize) shape and zeroed in place afterwards.
+        Downstream reordering/slicing copies out of these buffers, so reuse is
+        safe across iterations.
+        """
+        plen = self.config.data.max_prompt_length
+        rlen = self.config.data.max_response_length
+        if getattr(self, '_batch_buffers', None) is None or self._batch_buffers_shape != (bsize, esize):
+            self._batch_buffers = {
+                "input_ids": torch.zeros([bsize + esize, plen + rlen], dtype=torch.int64),
+                "attention_mask": torch.zeros([bsize + esize, plen + rlen], dtype=torch.int64),
+                "position_ids": torch.zeros([bsize + esize, plen + rlen], dtype=torch.int64),
+                "responses": torch.zeros([bsize + esize, rlen], dtype=torch.int64),
+                "reward": torch.zeros([bsize + esize], dtype=torch.float64),
+                "done": torch.zeros([bsize + esize], dtype=torch.float64),
+                "data_source": np.zeros([bsize]),
+                "ability": np.zeros([bsize]),
+                "reward_model": np.zeros([bsize]),
+                "extra_info": np.zeros([bsize]),
+                "raw_prompt_ids": np.zeros([bsize]),
+                "index": np.zeros([bsize]),
+            }
+            self._batch_buffers_shape = (bsize, esize)
+        else:
+            for buf in self._batch_buffers.values():
+                if isinstance(buf, torch.Tensor):
+                    buf.zero_()
+                else:
+                    buf.fill(0)
+        return self._batch_buffers
+
     def fit(self):
         """
         The training loop of PPO.
@@ -850,17 +1030,26 @@ class RayPPOTrainer(object):
             
             episode_done = np.zeros(self.config.envs.n_rollouts, dtype=np.bool_)
             max_seq_len = self.config.data.max_prompt_length
-            
+            self.tokenizer.padding_side = "left"
+
             while not np.all(episode_done):
-                
-                self.tokenizer.padding_side = "left"
-                input_obs = self.tokenizer.apply_chat_template(obs, tokenize=False, add_generation_prompt=True) #, enable_thinking=True)
-                input_obs = self.tokenizer(input_obs, return_tensors='pt', padding='max_length', truncation=True, max_length=max_seq_len)
-                        
+
+                # render + tokenize + pad in one fused call (same pattern as
+                # main_generation) instead of detokenized strings in between
+                input_obs = self.tokenizer.apply_chat_template(obs,
+                                                               add_generation_prompt=True,
+                                                               padding='max_length',
+                                                               truncation=True,
+                                                               max_length=max_seq_len,
+                                                               return_tensors='pt',
+                                                               return_dict=True,
+                                                               tokenize=True)
+
                 input_ids = input_obs['input_ids']
                 attention_mask = input_obs['attention_mask']
-                position_ids = attention_mask.long().cumsum(-1) - 1
+                position_ids = attention_mask.cumsum(-1, dtype=torch.int32).sub_(1)
                 position_ids.masked_fill_(attention_mask == 0, 1)
+                position_ids = position_ids.long()
                 
                 obs_data = {
                     'input_ids': input_ids,
@@ -908,23 +1097,7 @@ class RayPPOTrainer(object):
                     bsize = self.config.data.train_batch_size
                     
                 if self.global_steps == 1 or self.global_steps > self.critic_warmup_step:
-                    esize = self.config.envs.n_rollouts
-                    plen = self.config.data.max_prompt_length
-                    rlen = self.config.data.max_response_length
-                    batch_dict = {
-                        "input_ids": torch.zeros([bsize + esize, plen + rlen], dtype=torch.int64),
-                        "attention_mask": torch.zeros([bsize + esize, plen + rlen], dtype=torch.int64),
-                        "position_ids": torch.zeros([bsize + esize, plen + rlen], dtype=torch.int64),
-                        "responses": torch.zeros([bsize + esize, rlen], dtype=torch.int64),
-                        "reward": torch.zeros([bsize + esize], dtype=torch.float64),
-                        "done": torch.zeros([bsize + esize], dtype=torch.float64),
-                        "data_source": np.zeros([bsize]),
-                        "ability": np.zeros([bsize]),
-                        "reward_model": np.zeros([bsize]),
-                        "extra_info": np.zeros([bsize]),
-                        "raw_prompt_ids": np.zeros([bsize]),
-                        "index": np.zeros([bsize]),
-                    }
+                    batch_dict = self._get_batch_buffers(bsize, self.config.envs.n_rollouts)
         
                 metrics = {}
                 timing_raw = {}
@@ -941,20 +1114,30 @@ class RayPPOTrainer(object):
                     episode_len = bsize // self.config.envs.n_rollouts
                     
                     if self.global_steps == 1 or self.global_steps > self.critic_warmup_step:
-                        
+
+                        self.tokenizer.padding_side = "left"
+                        metric_bufs = {}
+
                         for time_step in range(episode_len+1):
-                            
-                            # TODO: move this to a function 
-                            
-                            self.tokenizer.padding_side = "left"
-                            input_obs = self.tokenizer.apply_chat_template(obs, tokenize=False, add_generation_prompt=True) #, enable_thinking=True)
-                            
-                            input_obs = self.tokenizer(input_obs, return_tensors='pt', padding='max_length', truncation=True, max_length=max_seq_len)
-                                    
+
+                            # TODO: move this to a function
+
+                            # render + tokenize + pad in one fused call, skipping
+                            # the intermediate list of detokenized prompt strings
+                            input_obs = self.tokenizer.apply_chat_template(obs,
+                                                                           add_generation_prompt=True,
+                                                                           padding='max_length',
+                                                                           truncation=True,
+                                                                           max_length=max_seq_len,
+                                                                           return_tensors='pt',
+                                                                           return_dict=True,
+                                                                           tokenize=True)
+
                             input_ids = input_obs['input_ids']
                             attention_mask = input_obs['attention_mask']
-                            position_ids = attention_mask.long().cumsum(-1) - 1
+                            position_ids = attention_mask.cumsum(-1, dtype=torch.int32).sub_(1)
                             position_ids.masked_fill_(attention_mask == 0, 1)
+                            position_ids = position_ids.long()
                             
                             obs_data = {
                                 'input_ids': input_ids,
@@ -974,32 +1157,45 @@ class RayPPOTrainer(object):
                                 
                             gen_batch.meta_info["step"] = time_step if time_step < episode_len - 1 else -1
                             gen_batch_output = self.actor_rollout_wg.generate_sequences(gen_batch)
-                            
+
                             response_ids = gen_batch_output.batch['responses']
                             actions = self.tokenizer.batch_decode(response_ids, skip_special_tokens=True)
-                            
-                            obs, reward, terminated, truncated, info = self.env.step(actions)
-                            
-                            done = np.logical_or(terminated, truncated)
-                            
-                            for key in info.keys():
-                                if key in metrics:
-                                    metrics[key].append(info[key])
-                                else:
-                                    metrics[key] = [info[key]]
-                            
-                            gen_batch_output.batch["done"] = done # TODO: check correctness
-                            gen_batch_output.batch["reward"] = reward
-                            
+
+                            # the next generate call depends on the env result,
+                            # so the rounds cannot be collapsed — but the heavy
+                            # row copies into the collection buffers can run
+                            # while the env workers are stepping
+                            self.env.step_async(actions)
+
+                            start_idx = time_step * self.config.envs.n_rollouts
+                            end_idx = (time_step + 1) * self.config.envs.n_rollouts
                             batch.insert(
                                 gen_batch_output,
-                                start_idx = time_step * self.config.envs.n_rollouts,
-                                end_idx = (time_step + 1) * self.config.envs.n_rollouts,
+                                start_idx=start_idx,
+                                end_idx=end_idx,
                             )
+
+                            obs, reward, terminated, truncated, info = self.env.step_wait()
+
+                            done = np.logical_or(terminated, truncated)
+
+                            # scalar env metrics land in fixed-size per-key
+                            # buffers instead of growing python lists; slots
+                            # for steps where a key is absent stay NaN
+                            for key in info.keys():
+                                buf = metric_bufs.get(key)
+                                if buf is None:
+                                    buf = metric_bufs[key] = np.full(episode_len + 1, np.nan)
+                                buf[time_step] = info[key]
+
+                            # TODO: check correctness
+                            batch.batch["done"][start_idx:end_idx] = torch.from_numpy(done)
+                            batch.batch["reward"][start_idx:end_idx] = torch.from_numpy(reward)
                         
-                        # merge batch metrics
-                        for key in metrics.keys():
-                            metrics[key] = np.mean(metrics[key])
+                        # merge batch metrics; nanmean averages each key over
+                        # the steps it actually appeared in
+                        for key, buf in metric_bufs.items():
+                            metrics[key] = np.nanmean(buf)
                             
                     if self.config.algorithm.adv_estimator == AdvantageEstimator.REMAX:
                         with _timer('gen_max', timing_raw):
@@ -1017,8 +1213,7 @@ class RayPPOTrainer(object):
 
                             del gen_baseline_batch, gen_baseline_output
 
-                    batch.non_tensor_batch['uid'] = np.array([str(uuid.uuid4()) for _ in range(len(batch.batch))],
-                                                                dtype=object)
+                    batch.non_tensor_batch['uid'] = _generate_uids(len(batch.batch))
                     # # repeat to align with repeated responses in rollout
                     # batch = batch.repeat(repeat_times=self.config.actor_rollout_ref.rollout.n, interleave=True)
                     # batch = batch.union(gen_batch_output)
@@ -1054,11 +1249,16 @@ class RayPPOTrainer(object):
                     with _timer('adv', timing_raw):
 
                         # compute rewards. apply_kl_penalty if available
-                        batch.batch['token_level_rewards'] = torch.zeros_like(batch.batch['response_mask'], dtype=torch.float64)
-                        seq_len = batch.batch['response_mask'].sum(-1) - 1
-                        indices = torch.arange(batch.batch['response_mask'].shape[0], device=seq_len.device)
-                        batch.batch['token_level_rewards'][indices, seq_len] = batch.batch['reward']
-                        batch.batch['token_level_scores'] = batch.batch['token_level_rewards'].clone() 
+                        # place each reward on its last response token with one
+                        # scatter instead of an arange + advanced-indexed assign;
+                        # empty rows wrap to the final position exactly like the
+                        # old indexing with -1 did
+                        response_mask = batch.batch['response_mask']
+                        token_level_rewards = torch.zeros(response_mask.shape, dtype=torch.float64)
+                        seq_len = response_mask.sum(-1, keepdim=True).sub_(1).remainder_(response_mask.shape[1])
+                        token_level_rewards.scatter_(1, seq_len, batch.batch['reward'].unsqueeze(1))
+                        batch.batch['token_level_rewards'] = token_level_rewards
+                        batch.batch['token_level_scores'] = token_level_rewards.clone()
                         if self.config.algorithm.use_kl_in_reward:
                             batch, kl_metrics = apply_kl_penalty(batch,
                                                                  kl_ctrl=self.kl_ctrl_in_reward,
@@ -1074,24 +1274,25 @@ class RayPPOTrainer(object):
                                                     token_lam=self.config.algorithm.token_lam,
                                                     n_rollouts=self.config.envs.n_rollouts)
 
+                    # take the training subset by row selection instead of
+                    # deepcopying the full batch (which also duplicated the
+                    # rows that are dropped right after)
                     if self.global_steps > self.critic_warmup_step:
-                        batch4train = deepcopy(batch)
-                        batch4train.batch = batch4train.batch[:bsize].contiguous()
-                        for key in batch4train.non_tensor_batch.keys():
-                            batch4train.non_tensor_batch[key] = batch4train.non_tensor_batch[key][:bsize]
-                        for key in batch4train.meta_info.keys():
-                            if isinstance(batch4train.meta_info[key], list):
-                                batch4train.meta_info[key] = batch4train.meta_info[key][:bsize]
+                        batch4train = batch.slice(end=bsize)
+                        batch4train.batch = batch4train.batch.contiguous()
+                        batch4train.meta_info = {
+                            key: value[:bsize] if isinstance(value, list) else value
+                            for key, value in batch.meta_info.items()
+                        }
                     else:
-                        batch4train = deepcopy(batch)
                         random_len = self.config.data.train_batch_size * 10
                         random_indices = torch.randperm(bsize)[:random_len]
-                        batch4train.batch = batch4train.batch[random_indices].contiguous()
-                        for key in batch4train.non_tensor_batch.keys():
-                            batch4train.non_tensor_batch[key] = batch4train.non_tensor_batch[key][random_indices]
-                        for key in batch4train.meta_info.keys():
-                            if isinstance(batch4train.meta_info[key], list):
-                                batch4train.meta_info[key] = [batch4train.meta_info[key][i.item()] for i in random_indices]
+                        batch4train = batch.select_idxs(random_indices)
+                        batch4train.batch = batch4train.batch.contiguous()
+                        batch4train.meta_info = {
+                            key: [value[i.item()] for i in random_indices] if isinstance(value, list) else value
+                            for key, value in batch.meta_info.items()
+                        }
 
 
                     # update critic
@@ -60,6 +60,14 @@ class BaseCheckpointManager:
     def load_checkpoint(self, local_path: str, hdfs_path: str = None, del_local_after_load: bool = False):
         raise NotImplementedError
 
+    def wait_for_previous_save(self):
+        """Block until any background checkpoint write has finished.
+
+        No-op here; managers that persist asynchronously override this so
+        callers can enforce shards-on-disk before advertising a checkpoint.
+        """
+        pass
+
     def save_checkpoint(self,
                         local_path: str,
                         hdfs_path: str = None,
@@ -121,6 +129,19 @@ class BaseCheckpointManager:
         random.setstate(rng_state['random'])
 
 
+def torch_load_maybe_mmap(path, weights_only=False):
+    """``torch.load`` with ``mmap=True`` when the installed torch supports it.
+
+    Memory-mapping keeps the pickle's tensor storages on disk instead of
+    read()-copying the whole file into RAM before deserialization; older torch
+    versions without the kwarg fall back to a plain load.
+    """
+    try:
+        return torch.load(path, weights_only=weights_only, mmap=True, map_location='cpu')
+    except TypeError:
+        return torch.load(path, weights_only=weights_only, map_location='cpu')
+
+
 def find_latest_ckpt_path(path, directory_format="global_step_{}"):
     if path is None:
         return None
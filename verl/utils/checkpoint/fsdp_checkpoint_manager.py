@@ -14,6 +14,7 @@
 
 import ray
 import os
+import threading
 
 import warnings
 from typing import Union
@@ -26,7 +27,7 @@ from verl.utils.fs import copy_to_local, is_non_local
 
 from transformers import PreTrainedTokenizer, ProcessorMixin
 
-from .checkpoint_manager import BaseCheckpointManager
+from .checkpoint_manager import BaseCheckpointManager, torch_load_maybe_mmap
 
 
 class FSDPCheckpointManager(BaseCheckpointManager):
@@ -64,6 +65,16 @@ class FSDPCheckpointManager(BaseCheckpointManager):
                          processing_class=processing_class,
                          checkpoint_contents=checkpoint_contents)
 
+        # background writer for the previous checkpoint; training only blocks
+        # on the CPU staging of state dicts, not on serialization + disk I/O
+        self._save_thread = None
+
+    def wait_for_previous_save(self):
+        """Block until the background write of the previous checkpoint finishes."""
+        if self._save_thread is not None:
+            self._save_thread.join()
+            self._save_thread = None
+
     def load_checkpoint(self, local_path: str, hdfs_path: str = None, del_local_after_load=False):
         if local_path is None:
             return
@@ -80,9 +91,11 @@ class FSDPCheckpointManager(BaseCheckpointManager):
         local_optim_path = copy_to_local(remote_optim_path)
         local_extra_state_path = copy_to_local(remote_extra_state_path)
 
-        model_state_dict = torch.load(local_model_path, weights_only=False)
-        optimizer_state_dict = torch.load(local_optim_path, weights_only=False)
-        extra_state_dict = torch.load(local_extra_state_path, weights_only=False)
+        # the shards were staged to CPU at save time; mmap the files so load
+        # doesn't materialize a second full copy of each shard in RAM
+        model_state_dict = torch_load_maybe_mmap(local_model_path, weights_only=False)
+        optimizer_state_dict = torch_load_maybe_mmap(local_optim_path, weights_only=False)
+        extra_state_dict = torch_load_maybe_mmap(local_extra_state_path, weights_only=False)
 
         if del_local_after_load:
             try:
@@ -117,6 +130,10 @@ class FSDPCheckpointManager(BaseCheckpointManager):
         # record the previous global step
         self.previous_global_step = global_step
 
+        # the previous checkpoint must be fully on disk before we start
+        # deleting old ones or writing the new shards
+        self.wait_for_previous_save()
+
         # remove previous local_path
         if max_ckpt_to_keep and isinstance(max_ckpt_to_keep, int) and max_ckpt_to_keep > 0 and len(
                 self.previous_saved_paths) >= max_ckpt_to_keep:
@@ -154,9 +171,24 @@ class FSDPCheckpointManager(BaseCheckpointManager):
                 print(f'[rank-{self.rank}]: Saving model to {os.path.abspath(model_path)}')
                 print(f'[rank-{self.rank}]: Saving checkpoint to {os.path.abspath(model_path)}')
                 print(f'[rank-{self.rank}]: Saving extra_state to {os.path.abspath(extra_path)}')
-                torch.save(model_state_dict, model_path)
-                torch.save(optimizer_state_dict, optim_path)  # TODO: address optimizer is None
-                torch.save(extra_state_dict, extra_path)
+
+                # the state dicts above are CPU copies (offload_to_cpu=True),
+                # so pickling + disk writes can run behind training; the next
+                # save (or an explicit wait_for_previous_save) joins this thread
+                def persist():
+                    # large write buffers coalesce the pickler's many small
+                    # writes into few syscalls; each shard lands under a temp
+                    # name and is renamed into place so a crash during the
+                    # background write never leaves a torn .pt behind
+                    for state, path in ((model_state_dict, model_path),
+                                        (optimizer_state_dict, optim_path),  # TODO: address optimizer is None
+                                        (extra_state_dict, extra_path)):
+                        with open(path + '.tmp', 'wb', buffering=8 * 1024 * 1024) as f:
+                            torch.save(state, f)
+                        os.replace(path + '.tmp', path)
+
+                self._save_thread = threading.Thread(target=persist, name=f'ckpt-save-rank{self.rank}', daemon=True)
+                self._save_thread.start()
 
         if "hf_model" in self.checkpoint_contents:
             # wait for everyone to dump to local
@@ -607,6 +607,14 @@ class ActorRolloutRefWorker(Worker):
         if self._is_offload_param:
             offload_fsdp_model_to_cpu(self.actor_module_fsdp)
 
+    @register(dispatch_mode=Dispatch.ONE_TO_ALL)
+    def wait_for_checkpoint_save(self):
+        # save_checkpoint returns once the state dicts are staged; callers use
+        # this barrier to guarantee the shards are on disk (e.g. before the
+        # driver advertises the step in the latest-checkpoint tracker)
+        assert self._is_actor
+        self.checkpoint_manager.wait_for_previous_save()
+
     @register(dispatch_mode=Dispatch.ONE_TO_ALL)
     def load_checkpoint(self, local_path, hdfs_path=None, del_local_after_load=False):
         if self._is_offload_param:
@@ -895,6 +903,11 @@ class CriticWorker(Worker):
         if self._is_offload_param:
             offload_fsdp_model_to_cpu(self.critic_module)
 
+    @register(dispatch_mode=Dispatch.ONE_TO_ALL)
+    def wait_for_checkpoint_save(self):
+        # block until the background shard write from save_checkpoint is on disk
+        self.checkpoint_manager.wait_for_previous_save()
+
     @register(dispatch_mode=Dispatch.ONE_TO_ALL)
     def load_checkpoint(self, local_path, hdfs_path=None, del_local_after_load=True):
         import torch
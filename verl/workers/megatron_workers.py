@@ -484,6 +484,10 @@ class ActorRolloutRefWorker(MegatronWorker):
                                                   global_step=global_step,
                                                   max_ckpt_to_keep=max_ckpt_to_keep)
 
+    @register(dispatch_mode=Dispatch.ONE_TO_ALL)
+    def wait_for_checkpoint_save(self):
+        self.checkpoint_mananager.wait_for_previous_save()
+
 
 class CriticWorker(MegatronWorker):
 
@@ -687,6 +691,10 @@ class CriticWorker(MegatronWorker):
                                                   global_step=global_steps,
                                                   max_ckpt_to_keep=max_ckpt_to_keep)
 
+    @register(dispatch_mode=Dispatch.ONE_TO_ALL)
+    def wait_for_checkpoint_save(self):
+        self.checkpoint_mananager.wait_for_previous_save()
+
 
 class RewardModelWorker(MegatronWorker):
     """